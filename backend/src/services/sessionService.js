@@ -1,5 +1,6 @@
 const { v4: uuidv4 } = require('uuid');
-const { tables, getItem, putItem, updateItem, queryGSI } = require('../utils/dynamodb');
+const { tables, getItem, queryGSI, transactWrite } = require('../utils/dynamodb');
+const { getCarriedProgress, getCarriedProgressMany } = require('../utils/simulatorCarry');
 const { NotFoundError, ConflictError, InvalidTransitionError, ValidationError } = require('../utils/errors');
 const stationService = require('./stationService');
 
@@ -11,6 +12,10 @@ const SESSION_TRANSITIONS = {
   FAILED: [],
 };
 
+// Attempts at stopping a session whose session, carry-over or port item
+// changes between the read and the transaction.
+const STOP_ATTEMPTS = 3;
+
 async function startSession(userId, stationId, portId, batteryCapacityKwh = 60) {
   const stationData = await stationService.getStation(stationId);
   if (stationData.status !== 'ACTIVE') {
@@ -49,44 +54,108 @@ async function startSession(userId, stationId, portId, batteryCapacityKwh = 60)
     updatedAt: now,
   };
 
-  await putItem(tables.sessions, sessionItem);
-  await stationService.updatePortStatus(stationId, portId, 'CHARGING');
+  // The session, the port and the station's port counters change together;
+  // the port guard also stops two users taking the same port.
+  try {
+    await transactWrite([
+      {
+        Put: {
+          TableName: tables.sessions,
+          Item: sessionItem,
+          ConditionExpression: 'attribute_not_exists(PK)',
+        },
+      },
+      ...stationService.portStatusActions(stationId, portId, 'FREE', 'CHARGING', now),
+    ]);
+  } catch (err) {
+    if (err.name === 'TransactionCanceledException') {
+      throw new ConflictError(`Port ${portId} is not free`);
+    }
+    throw err;
+  }
 
   return _formatSession(sessionItem);
 }
 
+// Interrupts an active session and frees its port in one transaction. Progress
+// the simulator computed but has not written yet is billed as well; the
+// session, the carry-over chunk and the port are read again if any of them
+// changes before the write.
 async function stopSession(sessionId, userId, isForceStop = false) {
-  const session = await getItem(tables.sessions, `SESSION#${sessionId}`, 'METADATA');
-  if (!session) throw new NotFoundError('Session', sessionId);
-
-  if (!isForceStop && session.userId !== userId) {
-    throw new ValidationError('You can only stop your own sessions');
+  for (let attempt = 0; attempt < STOP_ATTEMPTS; attempt++) {
+    const session = await getItem(tables.sessions, `SESSION#${sessionId}`, 'METADATA');
+    if (!session) throw new NotFoundError('Session', sessionId);
+
+    if (!isForceStop && session.userId !== userId) {
+      throw new ValidationError('You can only stop your own sessions');
+    }
+
+    const currentStatus = session.status;
+    if (!['STARTED', 'IN_PROGRESS'].includes(currentStatus)) {
+      if (attempt) throw new ConflictError('Session is no longer active');
+      throw new InvalidTransitionError(`Session is ${currentStatus}, cannot stop`);
+    }
+
+    const now = new Date().toISOString();
+    const { actions, changes } = await _stopActions(session, now);
+    const port = await getItem(tables.stations, `STATION#${session.stationId}`, `PORT#${session.portId}`);
+    if (port && port.status !== 'FREE') {
+      actions.push(...stationService.portStatusActions(session.stationId, session.portId, port.status, 'FREE', now));
+    }
+    try {
+      await transactWrite(actions);
+      return _formatSession({ ...session, ...changes });
+    } catch (err) {
+      if (err.name !== 'TransactionCanceledException') throw err;
+    }
   }
+  throw new ConflictError(`Session ${sessionId} is changing, try again`);
+}
 
-  const currentStatus = session.status;
-  if (!['STARTED', 'IN_PROGRESS'].includes(currentStatus)) {
-    throw new InvalidTransitionError(`Session is ${currentStatus}, cannot stop`);
+// The guarded session update interrupting `session`, plus a check that the
+// simulator's carry-over chunk it merged is still the one it read.
+async function _stopActions(session, now) {
+  const changes = { status: 'INTERRUPTED', updatedAt: now, completedAt: now };
+  const actions = [];
+  // A carry entry computed from an older copy of the session is superseded
+  // by what the simulator has written since.
+  const carried = await getCarriedProgress(session.stationId, session.sessionId);
+  if (carried && carried.entry[3] === (session.updatedAt || '')) {
+    const [chargePercent, energyConsumedKwh, totalCost] = carried.entry;
+    Object.assign(changes, { chargePercent, energyConsumedKwh, totalCost });
+    actions.push({
+      ConditionCheck: {
+        TableName: tables.sessions,
+        Key: { PK: carried.item.PK, SK: carried.item.SK },
+        ConditionExpression: 'savedAt = :saved',
+        ExpressionAttributeValues: { ':saved': carried.item.savedAt },
+      },
+    });
   }
-
-  const newStatus = isForceStop ? 'INTERRUPTED' : 'INTERRUPTED';
-  const now = new Date().toISOString();
-
-  const result = await updateItem(
-    tables.sessions,
-    `SESSION#${sessionId}`, 'METADATA',
-    'SET #status = :status, updatedAt = :now, completedAt = :now',
-    { ':status': newStatus, ':now': now },
-    { '#status': 'status' },
-  );
-
-  await stationService.updatePortStatus(session.stationId, session.portId, 'FREE');
-
-  return _formatSession(result);
+  const names = {};
+  const values = { ':started': 'STARTED', ':inProgress': 'IN_PROGRESS', ':seen': session.updatedAt || '' };
+  const assignments = Object.entries(changes).map(([attribute, value], n) => {
+    names[`#a${n}`] = attribute;
+    values[`:v${n}`] = value;
+    return `#a${n} = :v${n}`;
+  });
+  actions.unshift({
+    Update: {
+      TableName: tables.sessions,
+      Key: { PK: session.PK, SK: 'METADATA' },
+      UpdateExpression: `SET ${assignments.join(', ')}`,
+      ConditionExpression: '#a0 IN (:started, :inProgress) AND updatedAt = :seen',
+      ExpressionAttributeNames: names,
+      ExpressionAttributeValues: values,
+    },
+  });
+  return { actions, changes };
 }
 
 async function getSession(sessionId) {
   const item = await getItem(tables.sessions, `SESSION#${sessionId}`, 'METADATA');
   if (!item) throw new NotFoundError('Session', sessionId);
+  await _mergeCarriedProgress([item]);
   return _formatSession(item);
 }
 
@@ -95,13 +164,16 @@ async function getActiveSession(userId) {
     scanForward: false,
   });
   const active = items.find(s => ['STARTED', 'IN_PROGRESS'].includes(s.status));
-  return active ? _formatSession(active) : null;
+  if (!active) return null;
+  await _mergeCarriedProgress([active]);
+  return _formatSession(active);
 }
 
 async function getUserSessionHistory(userId) {
   const items = await queryGSI(tables.sessions, 'userId-index', 'userId', userId, {
     scanForward: false,
   });
+  await _mergeCarriedProgress(items);
   return items.map(_formatSession);
 }
 
@@ -110,18 +182,37 @@ async function getAllSessions(statusFilter) {
     const items = await queryGSI(tables.sessions, 'status-index', 'status', statusFilter, {
       scanForward: false,
     });
+    await _mergeCarriedProgress(items);
     return items.map(_formatSession);
   }
 
   const { scanTable } = require('../utils/dynamodb');
   const items = await scanTable(tables.sessions, 'SK = :sk', { ':sk': 'METADATA' });
+  await _mergeCarriedProgress(items);
   return items.map(_formatSession);
 }
 
 async function getActiveSessions() {
   const started = await queryGSI(tables.sessions, 'status-index', 'status', 'STARTED');
   const inProgress = await queryGSI(tables.sessions, 'status-index', 'status', 'IN_PROGRESS');
-  return [...started, ...inProgress].map(_formatSession);
+  const items = [...started, ...inProgress];
+  await _mergeCarriedProgress(items);
+  return items.map(_formatSession);
+}
+
+// Overlays the progress the simulator computed but has not written yet onto
+// the active sessions among `items`, in place; an entry computed from an
+// older copy of a session is ignored, as in stopSession.
+async function _mergeCarriedProgress(items) {
+  const active = items.filter(s => ['STARTED', 'IN_PROGRESS'].includes(s.status));
+  if (!active.length) return;
+  const progress = await getCarriedProgressMany(active);
+  for (const item of active) {
+    const entry = progress[item.sessionId];
+    if (entry && entry[3] === (item.updatedAt || '')) {
+      [item.chargePercent, item.energyConsumedKwh, item.totalCost] = entry;
+    }
+  }
 }
 
 function _formatSession(item) {
@@ -1,6 +1,7 @@
 const { v4: uuidv4 } = require('uuid');
-const { tables, getItem, putItem, updateItem, queryByPK, queryGSI, scanTable } = require('../utils/dynamodb');
-const { NotFoundError, InvalidTransitionError } = require('../utils/errors');
+const { tables, getItem, putItem, updateItem, queryByPK, queryGSI, scanTable, transactWrite } = require('../utils/dynamodb');
+const { NotFoundError, ConflictError, InvalidTransitionError } = require('../utils/errors');
+const { geoAttributes } = require('../utils/geohash');
 
 const STATION_TRANSITIONS = {
   NEW: ['ACTIVE'],
@@ -16,6 +17,14 @@ const PORT_TRANSITIONS = {
   ERROR: ['FREE'],
 };
 
+// Station METADATA counters of ports per status; see lambdas/shared/models.py.
+const PORT_COUNTER_ATTRIBUTES = {
+  FREE: 'freePorts',
+  RESERVED: 'reservedPorts',
+  CHARGING: 'chargingPorts',
+  ERROR: 'errorPorts',
+};
+
 async function listStations() {
   const items = await scanTable(tables.stations, 'SK = :sk', { ':sk': 'METADATA' });
   return items.map(_formatStation);
@@ -44,6 +53,7 @@ async function createStation({ name, address, latitude, longitude, totalPorts, p
   const stationItem = {
     PK: `STATION#${stationId}`,
     SK: 'METADATA',
+    entityType: 'STATION',
     stationId,
     name,
     address,
@@ -55,6 +65,12 @@ async function createStation({ name, address, latitude, longitude, totalPorts, p
     status: 'NEW',
     createdAt: now,
     updatedAt: now,
+    ...geoAttributes(latitude, longitude),
+    freePorts: totalPorts,
+    reservedPorts: 0,
+    chargingPorts: 0,
+    errorPorts: 0,
+    version: 1,
   };
   await putItem(tables.stations, stationItem);
 
@@ -89,8 +105,8 @@ async function updateStationStatus(stationId, newStatus) {
   const result = await updateItem(
     tables.stations,
     `STATION#${stationId}`, 'METADATA',
-    'SET #status = :status, updatedAt = :now',
-    { ':status': newStatus, ':now': new Date().toISOString() },
+    'SET #status = :status, updatedAt = :now, version = if_not_exists(version, :one) + :one',
+    { ':status': newStatus, ':now': new Date().toISOString(), ':one': 1 },
     { '#status': 'status' },
   );
   return _formatStation(result);
@@ -103,8 +119,8 @@ async function updateTariff(stationId, tariffPerKwh) {
   const result = await updateItem(
     tables.stations,
     `STATION#${stationId}`, 'METADATA',
-    'SET tariffPerKwh = :tariff, updatedAt = :now',
-    { ':tariff': tariffPerKwh, ':now': new Date().toISOString() },
+    'SET tariffPerKwh = :tariff, updatedAt = :now, version = if_not_exists(version, :one) + :one',
+    { ':tariff': tariffPerKwh, ':now': new Date().toISOString(), ':one': 1 },
   );
   return _formatStation(result);
 }
@@ -121,14 +137,49 @@ async function updatePortStatus(stationId, portId, newStatus) {
     );
   }
 
-  const result = await updateItem(
-    tables.stations,
-    `STATION#${stationId}`, `PORT#${portId}`,
-    'SET #status = :status, updatedAt = :now',
-    { ':status': newStatus, ':now': new Date().toISOString() },
-    { '#status': 'status' },
-  );
-  return _formatPort(result);
+  // The port and the station's counters change together, and only if the
+  // port is still in the status it was read in.
+  const now = new Date().toISOString();
+  try {
+    await transactWrite(portStatusActions(stationId, portId, currentStatus, newStatus, now));
+  } catch (err) {
+    if (err.name === 'TransactionCanceledException') {
+      throw new ConflictError(`Port ${portId} changed while updating, try again`);
+    }
+    throw err;
+  }
+  return _formatPort({ ...port, status: newStatus, updatedAt: now });
+}
+
+// Transaction actions moving a port from `fromStatus` to `toStatus` while it
+// is still in `fromStatus`, and shifting the station's counters to match;
+// see port_status_actions in lambdas/shared/db.py.
+function portStatusActions(stationId, portId, fromStatus, toStatus, now) {
+  return [
+    {
+      Update: {
+        TableName: tables.stations,
+        Key: { PK: `STATION#${stationId}`, SK: `PORT#${portId}` },
+        UpdateExpression: 'SET #status = :status, updatedAt = :now',
+        ConditionExpression: '#status = :current',
+        ExpressionAttributeNames: { '#status': 'status' },
+        ExpressionAttributeValues: { ':status': toStatus, ':current': fromStatus, ':now': now },
+      },
+    },
+    {
+      Update: {
+        TableName: tables.stations,
+        Key: { PK: `STATION#${stationId}`, SK: 'METADATA' },
+        UpdateExpression: 'ADD #from :minusOne, #to :one SET version = if_not_exists(version, :one) + :one',
+        ConditionExpression: 'attribute_exists(PK)',
+        ExpressionAttributeNames: {
+          '#from': PORT_COUNTER_ATTRIBUTES[fromStatus],
+          '#to': PORT_COUNTER_ATTRIBUTES[toStatus],
+        },
+        ExpressionAttributeValues: { ':minusOne': -1, ':one': 1 },
+      },
+    },
+  ];
 }
 
 async function getFreePorts(stationId) {
@@ -147,6 +198,7 @@ function _formatStation(item) {
     powerKw: Number(item.powerKw),
     tariffPerKwh: Number(item.tariffPerKwh),
     status: item.status,
+    version: Number(item.version || 1),
     createdAt: item.createdAt,
     updatedAt: item.updatedAt,
   };
@@ -170,6 +222,7 @@ module.exports = {
   updateStationStatus,
   updateTariff,
   updatePortStatus,
+  portStatusActions,
   getFreePorts,
   STATION_TRANSITIONS,
   PORT_TRANSITIONS,
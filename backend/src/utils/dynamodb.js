@@ -1,5 +1,5 @@
 const { DynamoDBClient } = require('@aws-sdk/client-dynamodb');
-const { DynamoDBDocumentClient, GetCommand, PutCommand, UpdateCommand, DeleteCommand, QueryCommand, ScanCommand } = require('@aws-sdk/lib-dynamodb');
+const { DynamoDBDocumentClient, GetCommand, PutCommand, UpdateCommand, DeleteCommand, QueryCommand, ScanCommand, TransactWriteCommand } = require('@aws-sdk/lib-dynamodb');
 const config = require('../config');
 
 const clientConfig = { region: config.aws.region };
@@ -118,6 +118,10 @@ async function scanTable(tableName, filterExpression, exprAttrValues, exprAttrNa
   return Items || [];
 }
 
+async function transactWrite(transactItems) {
+  await docClient.send(new TransactWriteCommand({ TransactItems: transactItems }));
+}
+
 module.exports = {
   docClient,
   tables,
@@ -128,4 +132,5 @@ module.exports = {
   queryByPK,
   queryGSI,
   scanTable,
+  transactWrite,
 };
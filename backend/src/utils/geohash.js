@@ -0,0 +1,38 @@
+// Geohash attributes for the Stations geo-index; must match lambdas/shared/geo.py.
+const BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz';
+const GEOHASH_PRECISION = 9;
+const GEO_PARTITION_PRECISION = 4;
+
+function encodeGeohash(latitude, longitude, precision = GEOHASH_PRECISION) {
+  const lat = [-90, 90];
+  const lon = [-180, 180];
+  let hash = '';
+  let bits = 0;
+  let value = 0;
+  let even = true;
+  while (hash.length < precision) {
+    const [range, coordinate] = even ? [lon, longitude] : [lat, latitude];
+    const mid = (range[0] + range[1]) / 2;
+    value <<= 1;
+    if (coordinate >= mid) {
+      value |= 1;
+      range[0] = mid;
+    } else {
+      range[1] = mid;
+    }
+    even = !even;
+    if (++bits === 5) {
+      hash += BASE32[value];
+      bits = 0;
+      value = 0;
+    }
+  }
+  return hash;
+}
+
+function geoAttributes(latitude, longitude) {
+  const geohash = encodeGeohash(Number(latitude), Number(longitude));
+  return { geohash, geoCell: geohash.slice(0, GEO_PARTITION_PRECISION) };
+}
+
+module.exports = { encodeGeohash, geoAttributes };
@@ -0,0 +1,57 @@
+// Progress the charging simulator computed but has not written to a session
+// yet (lambdas/shared/db.py get_carried_progress); bucketing must match it.
+const { tables, queryByPK } = require('./dynamodb');
+
+const SIMULATOR_BUCKETS = 32;
+const SIMULATOR_CARRY_PK = 'SIMULATOR#CARRY';
+
+const CRC32_TABLE = Array.from({ length: 256 }, (_, n) => {
+  let c = n;
+  for (let k = 0; k < 8; k++) c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+  return c >>> 0;
+});
+
+function crc32(text) {
+  let crc = 0xffffffff;
+  for (const byte of Buffer.from(text, 'utf8')) {
+    crc = CRC32_TABLE[(crc ^ byte) & 0xff] ^ (crc >>> 8);
+  }
+  return (crc ^ 0xffffffff) >>> 0;
+}
+
+function simulatorBucket(stationId) {
+  return crc32(stationId) % SIMULATOR_BUCKETS;
+}
+
+// Returns { entry: [chargePercent, energyConsumedKwh, totalCost, updatedAt], item } or null.
+async function getCarriedProgress(stationId, sessionId) {
+  const prefix = `BUCKET#${String(simulatorBucket(stationId)).padStart(2, '0')}#`;
+  const items = await queryByPK(tables.sessions, SIMULATOR_CARRY_PK, prefix);
+  for (const item of items) {
+    const entry = (item.sessions || {})[sessionId];
+    if (entry) return { entry, item };
+  }
+  return null;
+}
+
+// { sessionId: entry } for `sessions`, reading each bucket they fall in once.
+async function getCarriedProgressMany(sessions) {
+  const wanted = new Map();
+  for (const { stationId, sessionId } of sessions) {
+    const bucket = simulatorBucket(stationId);
+    if (!wanted.has(bucket)) wanted.set(bucket, new Set());
+    wanted.get(bucket).add(sessionId);
+  }
+  const progress = {};
+  await Promise.all([...wanted].map(async ([bucket, sessionIds]) => {
+    const prefix = `BUCKET#${String(bucket).padStart(2, '0')}#`;
+    for (const item of await queryByPK(tables.sessions, SIMULATOR_CARRY_PK, prefix)) {
+      for (const [sessionId, entry] of Object.entries(item.sessions || {})) {
+        if (sessionIds.has(sessionId)) progress[sessionId] = entry;
+      }
+    }
+  }));
+  return progress;
+}
+
+module.exports = { simulatorBucket, getCarriedProgress, getCarriedProgressMany };
@@ -4,13 +4,31 @@ Simulates charging ticks for all active sessions using a nonlinear charging curv
 """
 
 import os
+import asyncio
 import json
+import math
+import queue
+import time
 import uuid
-from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from decimal import Decimal
 
 import boto3
+import numpy as np
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, ConnectTimeoutError, EndpointConnectionError
+
+from shared.cache import station_cache as station_metadata_cache
+from shared.db import (
+    BATCH_MAX_ATTEMPTS, SIMULATOR_BUCKETS, SIMULATOR_CARRY_PK, TRANSACTION_RETRYABLE_ERROR_CODES, backoff,
+    batch_get_items, batch_put_items, chunked, get_dynamodb_client, get_dynamodb_resource,
+    port_counter_action, port_status_actions, simulator_bucket,
+)
+from shared.logger import log_db_usage
 
 SESSIONS_TABLE = os.environ.get("SESSIONS_TABLE", "Sessions")
 STATIONS_TABLE = os.environ.get("STATIONS_TABLE", "Stations")
@@ -19,72 +37,726 @@ REGION = os.environ.get("AWS_REGION_NAME", "us-east-1")
 
 TICK_INTERVAL_SECONDS = 10
 TICKS_PER_INVOCATION = 6
+SIMULATION_WINDOW_SECONDS = TICK_INTERVAL_SECONDS * TICKS_PER_INVOCATION
+
+# Bands of calculate_power_factor as (upper charge percent, power factor).
+CHARGING_CURVE = ((70.0, 1.0), (90.0, 0.6), (100.0, 0.3))
+NOTIFY_CHARGE_PERCENT = 80.0
+
+ACTIVE_SESSION_STATUSES = ("STARTED", "IN_PROGRESS")
+
+# "vectorized" advances all sessions per tick in one NumPy pass,
+# "reference" keeps the original per-session loop for comparison,
+# "analytic" integrates the charging curve over the whole window in closed form.
+SIMULATOR_ENGINE = os.environ.get("SIMULATOR_ENGINE", "vectorized")
+
+# "batch" computes all ticks of the minute at once; "realtime" stays resident
+# and advances and flushes sessions on every TICK_INTERVAL_SECONDS boundary.
+SIMULATOR_MODE = os.environ.get("SIMULATOR_MODE", "batch")
+
+# "redistribute" hands power left unused by tapering sessions to sessions
+# still in the full-power band; "even" splits station power per active port.
+POWER_ALLOCATION = os.environ.get("SIMULATOR_POWER_ALLOCATION", "redistribute")
+
+# Sessions are processed in station-aligned chunks; before each chunk the
+# remaining Lambda time is checked and the rest is deferred to a cursor.
+CHUNK_SESSIONS = int(os.environ.get("SIMULATOR_CHUNK_SESSIONS", "5000"))
+TIME_BUDGET_MARGIN_MS = int(os.environ.get("SIMULATOR_TIME_BUDGET_MARGIN_MS", "3000"))
+CURSOR_PK = "SIMULATOR#CURSOR"
+CURSOR_STATIONS_PER_ITEM = 5000
 
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
+# A session is written when its status changes or it raises a notification,
+# otherwise only once its charge moved PERSIST_MIN_CHARGE_DELTA percent or
+# its stored copy is PERSIST_MAX_AGE_SECONDS old. Progress of skipped
+# sessions is kept in a compact carry-over record. A delta of 0 writes every run.
+PERSIST_MIN_CHARGE_DELTA = float(os.environ.get("SIMULATOR_PERSIST_MIN_CHARGE_DELTA", "2.0"))
+PERSIST_MAX_AGE_SECONDS = int(os.environ.get("SIMULATOR_PERSIST_MAX_AGE_SECONDS", "300"))
+# Realtime mode exists to show progress every tick, so by default it writes
+# every session on every tick.
+REALTIME_PERSIST_MIN_CHARGE_DELTA = float(
+    os.environ.get("SIMULATOR_REALTIME_PERSIST_MIN_CHARGE_DELTA", "0")
+)
+CARRY_PK = SIMULATOR_CARRY_PK
+CARRY_SESSIONS_PER_ITEM = 2500
+
+# With SIMULATOR_SHARDS > 1 a scheduled run becomes a coordinator that fans
+# the fleet out to one worker per shard and aggregates their results.
+# Stations hash (crc32) into SHARD_BUCKETS fixed buckets and shard k of n owns
+# the buckets b with b % n == k, so a station's sessions always tick together
+# and cursor/carry-over records (kept per bucket) survive a change of n.
+# SIMULATOR_DISPATCH is "lambda" (parallel self-invocations) or "process"
+# (a local process pool, for testing outside Lambda).
+SIMULATOR_SHARDS = int(os.environ.get("SIMULATOR_SHARDS", "1"))
+SIMULATOR_DISPATCH = os.environ.get("SIMULATOR_DISPATCH", "lambda")
+SHARD_BUCKETS = SIMULATOR_BUCKETS
+# A worker may run almost to the coordinator's deadline, so the invoke must
+# outlast the 70s function timeout; it is never retried, as a retried
+# synchronous invoke would tick and bill the shard's sessions twice.
+SHARD_INVOKE_READ_TIMEOUT_SECONDS = 75
+# Lambda answers an invoke it rejected (throttled, function not ready, bad
+# request) with a 4xx before running anything; a 5xx or a read timeout leaves
+# open whether the worker ran.
+SHARD_INVOKE_REJECTED_MAX_STATUS = 499
+
+STATION_FETCH_WORKERS = int(os.environ.get("SIMULATOR_STATION_FETCH_WORKERS", "8"))
+WRITE_BATCH_SIZE = 25
+TRANSACT_MAX_ACTIONS = 100
+WRITE_MAX_WORKERS = int(os.environ.get("SIMULATOR_WRITE_WORKERS", "8"))
+
+dynamodb = get_dynamodb_resource(REGION)
 sessions_table = dynamodb.Table(SESSIONS_TABLE)
 stations_table = dynamodb.Table(STATIONS_TABLE)
 error_logs_table = dynamodb.Table(ERROR_LOGS_TABLE)
+# A plain client: the resource's meta.client applies the high-level type
+# transformation, which would serialize the DynamoDB-JSON below a second time.
+dynamodb_client = get_dynamodb_client(REGION)
+lambda_client = boto3.client("lambda", region_name=REGION, config=Config(
+    read_timeout=SHARD_INVOKE_READ_TIMEOUT_SECONDS,
+    retries={"total_max_attempts": 1},
+))
+serializer = TypeSerializer()
 
 
+@log_db_usage("charging_simulator")
 def lambda_handler(event, context):
-    """Main entry point for EventBridge scheduled invocation."""
+    """
+    Main entry point for EventBridge scheduled invocation. Events carrying a
+    "shard" are worker invocations dispatched by a coordinator run.
+    """
     print(f"Charging Simulator invoked at {datetime.now(timezone.utc).isoformat()}")
 
     try:
-        active_sessions = _get_active_sessions()
-        print(f"Found {len(active_sessions)} active sessions")
+        event = event or {}
+        engine = event.get("engine", SIMULATOR_ENGINE)
+        mode = event.get("mode", SIMULATOR_MODE)
+        shards = int(event.get("shards", SIMULATOR_SHARDS))
+        if not 1 <= shards <= SHARD_BUCKETS:
+            raise ValueError(f"shards must be between 1 and {SHARD_BUCKETS}, got {shards}")
+        deadline_ms = event.get("deadlineMs") or _deadline_ms(context)
 
-        if not active_sessions:
-            return {"statusCode": 200, "body": "No active sessions"}
+        if "shard" in event:
+            results = _run_shard(int(event["shard"]), shards, engine, deadline_ms, mode)
+        elif shards > 1:
+            results = _run_coordinator(shards, engine, deadline_ms, mode, context)
+        else:
+            results = _run_shard(0, 1, engine, deadline_ms, mode)
+            if not results["sessions"]:
+                return {"statusCode": 200, "body": "No active sessions"}
 
-        station_cache = {}
-        results = {"updated": 0, "completed": 0, "errors": 0, "notifications": []}
+        print(f"Simulator results: {json.dumps(results, default=str)}")
+        return {"statusCode": 200, "body": json.dumps(results, default=str)}
 
-        for session in active_sessions:
-            try:
-                station_id = session["stationId"]
-                if station_id not in station_cache:
-                    station_cache[station_id] = _get_station_data(station_id)
+    except Exception as e:
+        _log_error("charging_simulator", "CRITICAL", f"Simulator failure: {e}")
+        print(f"CRITICAL: Simulator failure: {e}")
+        raise
 
-                station = station_cache[station_id]
-                if not station:
-                    continue
 
-                active_ports_count = _count_active_ports_on_station(
-                    station_id, active_sessions
+def _new_results():
+    return {
+        "sessions": 0, "updated": 0, "completed": 0, "errors": 0, "conflicts": 0,
+        "deferred": 0, "resumed": 0, "notifications": [], "flushes": [],
+        "persistence": {
+            "suppressed": 0, "carried": 0, "suppressedWriteUnits": 0,
+            "carryWriteUnits": 0, "netWriteUnitsSaved": 0,
+        },
+    }
+
+
+def _run_shard(shard, shards, engine, deadline_ms, mode="batch"):
+    """Tick, persist and notify every active session on the stations of one shard."""
+    buckets = _shard_buckets(shard, shards)
+    results = _new_results()
+    cursor = _load_cursor(buckets)
+    carry_over = _load_carry_over(buckets)
+    carry = {}
+    active_sessions, station_cache, failed_stations = _discover_active_sessions(buckets)
+    results["sessions"] = len(active_sessions)
+    print(f"Shard {shard}/{shards}: found {len(active_sessions)} active sessions "
+          f"on {len(station_cache)} stations")
+
+    if not active_sessions:
+        _save_cursor({}, cursor)
+        _save_carry_over({}, carry_over)
+        return results
+
+    realtime = mode == "realtime"
+    load_index = _build_station_load_index(active_sessions)
+    batch = []
+    for session in active_sessions:
+        try:
+            station_id = session["stationId"]
+            if station_id in failed_stations:
+                raise RuntimeError(f"Station {station_id} metadata unavailable")
+
+            station = station_cache[station_id]
+            if not station:
+                continue
+
+            state = SessionState(session, station, len(load_index[station_id]))
+            carried = carry_over["sessions"].get(state.session_id)
+            if carried:
+                state.restore(carried)
+            owed_windows = cursor["stations"].get(station_id, 0)
+            if owed_windows and session.get("createdAt", "") < cursor["savedAt"]:
+                state.ticks += TICKS_PER_INVOCATION * owed_windows
+                results["resumed"] += 1
+            if realtime:
+                state.ticks -= TICKS_PER_INVOCATION - 1
+            batch.append(state)
+
+        except Exception as e:
+            results["errors"] += 1
+            if session.get("sessionId") in carry_over["sessions"]:
+                carry[session["sessionId"]] = (
+                    session["stationId"], carry_over["sessions"][session["sessionId"]]
                 )
+            _log_error("charging_simulator", "ERROR", str(e), session.get("sessionId"))
+            print(f"Error processing session {session.get('sessionId')}: {e}")
 
-                for _ in range(TICKS_PER_INVOCATION):
-                    session, notifications = _simulate_tick(
-                        session, station, active_ports_count
+    run_ticks = TICK_ENGINES.get(engine, _run_vectorized_ticks)
+    deferred = {}
+    if realtime:
+        refresh = partial(_discover_active_sessions, buckets)
+        results["realtime"] = asyncio.run(
+            _run_realtime(batch, run_ticks, results, carry, deadline_ms, refresh, station_cache)
+        )
+        batch = []
+
+    # Stations left over from a previous run that hit its deadline go first.
+    chunks = _plan_chunks(batch, cursor["stations"])
+    slowest_chunk_ms = 0
+    for n, chunk in enumerate(chunks):
+        remaining_ms = _remaining_time_ms(deadline_ms)
+        if remaining_ms is not None and remaining_ms - TIME_BUDGET_MARGIN_MS < slowest_chunk_ms:
+            for state in (s for later in chunks[n:] for s in later):
+                deferred[state.station_id] = cursor["stations"].get(state.station_id, 0) + 1
+                results["deferred"] += 1
+                if state.session_id in carry_over["sessions"]:
+                    carry[state.session_id] = (
+                        state.station_id, carry_over["sessions"][state.session_id]
                     )
-                    results["notifications"].extend(notifications)
+            print(f"Time budget reached with {remaining_ms}ms left; "
+                  f"deferring {results['deferred']} sessions on {len(deferred)} stations")
+            break
 
-                    if session["status"] in ("COMPLETED", "FAILED"):
-                        break
+        started = time.perf_counter()
+        _process_chunk(chunk, run_ticks, results, carry)
+        slowest_chunk_ms = max(slowest_chunk_ms, (time.perf_counter() - started) * 1000)
 
-                _save_session(session)
-                if session["status"] == "COMPLETED":
-                    results["completed"] += 1
-                    _free_port(session["stationId"], session["portId"])
-                else:
-                    results["updated"] += 1
+    _save_cursor(deferred, cursor)
+    persistence = results["persistence"]
+    persistence["carried"] = len(carry)
+    persistence["carryWriteUnits"] = _save_carry_over(carry, carry_over)
+    persistence["netWriteUnitsSaved"] = (
+        persistence["suppressedWriteUnits"] - persistence["carryWriteUnits"]
+    )
+    results["stationCache"] = station_metadata_cache.stats()
+    print(f"Persistence: suppressed {persistence['suppressed']} session writes "
+          f"(~{persistence['suppressedWriteUnits']} WCU) for "
+          f"{persistence['carryWriteUnits']} WCU of carry-over")
+    return results
+
+
+def _run_coordinator(shards, engine, deadline_ms, mode, context):
+    """Dispatch every shard to a parallel worker and aggregate their results."""
+    results = _new_results()
+    results["shards"] = []
+    results["deferredShards"] = []
+    dispatch = _invoke_shard_lambda if SIMULATOR_DISPATCH == "lambda" else _run_shard
+    executor = ThreadPoolExecutor if SIMULATOR_DISPATCH == "lambda" else ProcessPoolExecutor
+    function_name = getattr(context, "invoked_function_arn", None)
 
+    started = time.perf_counter()
+    with executor(max_workers=shards) as pool:
+        futures = []
+        for shard in range(shards):
+            args = (shard, shards, engine, deadline_ms, mode)
+            if dispatch is _invoke_shard_lambda:
+                args += (function_name,)
+            futures.append((shard, pool.submit(dispatch, *args)))
+
+        for shard, future in futures:
+            summary = {"shard": shard}
+            try:
+                shard_results = future.result()
+                _merge_results(results, shard_results)
+                summary["sessions"] = shard_results["sessions"]
+                if "realtime" in shard_results:
+                    summary["realtime"] = shard_results["realtime"]
+            except (BotoCoreError, ClientError) as e:
+                results["deferredShards"].append(shard)
+                summary["deferred"] = True
+                summary["error"] = str(e)
+                if _worker_never_started(e):
+                    # Its sessions missed this window: owe it to them.
+                    try:
+                        summary["catchUpStations"] = _defer_shard(shard, shards)
+                        _log_error("charging_simulator", "WARNING",
+                                   f"Shard {shard}/{shards} invoke rejected, catch-up saved: {e}")
+                        print(f"Shard {shard}/{shards} rejected; "
+                              f"{summary['catchUpStations']} stations owed a window: {e}")
+                    except Exception as save_error:
+                        results["errors"] += 1
+                        summary["error"] = f"{e}; catch-up not saved: {save_error}"
+                        _log_error("charging_simulator", "ERROR",
+                                   f"Shard {shard}/{shards} catch-up not saved: {save_error}")
+                        print(f"Error saving catch-up for shard {shard}/{shards}: {save_error}")
+                else:
+                    # The worker may still be running or may have finished; its
+                    # sessions are left to it and to the next scheduled run.
+                    _log_error("charging_simulator", "WARNING", f"Shard {shard}/{shards} invoke failed, deferred: {e}")
+                    print(f"Shard {shard}/{shards} deferred after failed invoke: {e}")
             except Exception as e:
                 results["errors"] += 1
-                _log_error("charging_simulator", "ERROR", str(e), session.get("sessionId"))
-                print(f"Error processing session {session.get('sessionId')}: {e}")
+                summary["error"] = str(e)
+                _log_error("charging_simulator", "ERROR", f"Shard {shard}/{shards} failed: {e}")
+                print(f"Error in shard {shard}/{shards}: {e}")
+            results["shards"].append(summary)
 
-        for notif in results["notifications"]:
-            _log_notification(notif)
+    elapsed = time.perf_counter() - started
+    print(f"Coordinator: {shards} shards via {SIMULATOR_DISPATCH}, "
+          f"{results['sessions']} sessions in {elapsed:.3f}s")
+    return results
 
-        print(f"Simulator results: {json.dumps(results, default=str)}")
-        return {"statusCode": 200, "body": json.dumps(results, default=str)}
 
+def _invoke_shard_lambda(shard, shards, engine, deadline_ms, mode, function_name):
+    """
+    Run one shard in a synchronous invocation of this function and return its
+    results. A failed invoke raises the botocore error and is not retried.
+    """
+    payload = {
+        "shard": shard, "shards": shards, "engine": engine,
+        "mode": mode, "deadlineMs": deadline_ms,
+    }
+    resp = lambda_client.invoke(
+        FunctionName=function_name or os.environ["AWS_LAMBDA_FUNCTION_NAME"],
+        InvocationType="RequestResponse",
+        Payload=json.dumps(payload).encode(),
+    )
+    body = json.loads(resp["Payload"].read() or b"null")
+    if resp.get("FunctionError"):
+        raise RuntimeError((body or {}).get("errorMessage", resp["FunctionError"]))
+    return json.loads(body["body"])
+
+
+def _worker_never_started(error):
+    """True when a failed shard invoke proves the worker did not run."""
+    if isinstance(error, (ConnectTimeoutError, EndpointConnectionError)):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 500
+        return status <= SHARD_INVOKE_REJECTED_MAX_STATUS
+    return False
+
+
+def _defer_shard(shard, shards):
+    """
+    Owe one more window to every station with active sessions in a shard whose
+    worker never ran, the way a worker defers stations at its deadline, so the
+    next run catches their sessions up. Returns the number of stations owed.
+    """
+    buckets = _shard_buckets(shard, shards)
+    cursor = _load_cursor(buckets)
+    deferred = {}
+    for page in _iter_active_session_pages():
+        for session in page:
+            station_id = session["stationId"]
+            if simulator_bucket(station_id) in buckets:
+                deferred[station_id] = cursor["stations"].get(station_id, 0) + 1
+    _save_cursor(deferred, cursor)
+    return len(deferred)
+
+
+def _merge_results(total, part):
+    """Add one shard's results into the coordinator's totals."""
+    for key, value in part.items():
+        if key == "persistence":
+            for name, count in value.items():
+                total["persistence"][name] = total["persistence"].get(name, 0) + count
+        elif isinstance(value, dict):
+            continue
+        elif isinstance(value, list):
+            total.setdefault(key, []).extend(value)
+        elif isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+
+
+def _shard_buckets(shard, shards):
+    return frozenset(b for b in range(SHARD_BUCKETS) if b % shards == shard)
+
+
+def _deadline_ms(context):
+    """
+    Epoch milliseconds by which this invocation must finish, or None outside
+    Lambda. Capped at one simulation window so a run never overlaps the next
+    scheduled one.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    remaining_ms = min(context.get_remaining_time_in_millis(), SIMULATION_WINDOW_SECONDS * 1000)
+    return int(time.time() * 1000) + remaining_ms
+
+
+def _discover_active_sessions(buckets, known_stations=None):
+    """
+    Stream the active sessions on stations in `buckets` and prefetch their
+    stations. Station metadata for each page's new stationIds is fetched with
+    BatchGetItem on a worker pool while later pages are still streaming in;
+    stations already in `known_stations` or the shared station cache are not
+    fetched again.
+    Returns (active_sessions, station_cache, failed_station_ids).
+    """
+    station_cache = dict(known_stations or {})
+    active_sessions = []
+    seen_ids = set()
+    failed_stations = set()
+    with ThreadPoolExecutor(max_workers=STATION_FETCH_WORKERS) as station_pool:
+        station_fetches = []
+        for page in _iter_active_session_pages():
+            new_station_ids = []
+            for session in page:
+                if session["sessionId"] in seen_ids:
+                    continue
+                if simulator_bucket(session["stationId"]) not in buckets:
+                    continue
+                seen_ids.add(session["sessionId"])
+                active_sessions.append(session)
+                if session["stationId"] not in station_cache:
+                    cached = station_metadata_cache.get(session["stationId"])
+                    station_cache[session["stationId"]] = cached
+                    if cached is None:
+                        new_station_ids.append(session["stationId"])
+            if new_station_ids:
+                station_fetches.append((station_pool.submit(_fetch_stations, new_station_ids), new_station_ids))
+
+        for future, station_ids in station_fetches:
+            try:
+                stations, failed = future.result()
+            except Exception as e:
+                stations, failed = {}, dict.fromkeys(station_ids, str(e))
+            station_cache.update(stations)
+            if failed:
+                failed_stations.update(failed)
+                error = next(iter(failed.values()))
+                _log_error("charging_simulator", "ERROR", f"Station prefetch failed: {error}")
+                print(f"Error prefetching {len(failed)} stations: {error}")
+
+    return active_sessions, station_cache, failed_stations
+
+
+def _plan_chunks(batch, priority_stations):
+    """
+    Split the batch into chunks of whole stations (power sharing stays exact
+    within a chunk), with stations from `priority_stations` first.
+    """
+    by_station = {}
+    for state in batch:
+        by_station.setdefault(state.station_id, []).append(state)
+    order = sorted(by_station, key=lambda station_id: station_id not in priority_stations)
+
+    chunks = []
+    current = []
+    for station_id in order:
+        if current and len(current) + len(by_station[station_id]) > CHUNK_SESSIONS:
+            chunks.append(current)
+            current = []
+        current.extend(by_station[station_id])
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _process_chunk(chunk, run_ticks, results, carry):
+    """
+    Tick one chunk of sessions, persist the ones the write policy selects
+    (the rest go to `carry`) and send the chunk's notifications.
+    """
+    notifications = run_ticks(chunk)
+    writer = _stage_writes(chunk, notifications, results, carry)
+    _flush_writes(writer, notifications, results)
+
+
+def _stage_writes(chunk, notifications, results, carry, min_charge_delta=None):
+    """
+    Buffer the writes the persistence policy selects for a ticked chunk;
+    `min_charge_delta` overrides PERSIST_MIN_CHARGE_DELTA.
+    """
+    now_dt = datetime.now(timezone.utc)
+    now = now_dt.isoformat()
+    notified = {n["sessionId"] for n in notifications}
+    persistence = results["persistence"]
+    writer = SessionWriter()
+    for state in chunk:
+        if not _should_persist(state, now_dt, notified, min_charge_delta):
+            carry[state.session_id] = (state.station_id, state.carry_entry())
+            persistence["suppressed"] += 1
+            persistence["suppressedWriteUnits"] += _write_units(state.item)
+            continue
+        carry.pop(state.session_id, None)
+        changes = state.to_update(now)
+        if state.status == "COMPLETED":
+            writer.complete(state.item, changes)
+        else:
+            writer.save(state.item, changes)
+    return writer
+
+
+def _flush_writes(writer, notifications, results):
+    """Flush staged writes and send notifications; returns the conflicting sessionIds."""
+    flush = writer.flush()
+    results["updated"] += flush.pop("updated")
+    results["completed"] += flush.pop("completed")
+    conflicts = set(flush.pop("conflicts"))
+    results["conflicts"] += len(conflicts)
+    for session_id, error in flush.pop("failed").items():
+        results["errors"] += 1
+        _log_error("charging_simulator", "ERROR", error, session_id)
+        print(f"Error processing session {session_id}: {error}")
+    results["flushes"].append(flush)
+    print(f"Flushed {flush['sessions']} sessions in {flush['requests']} requests, "
+          f"{flush['seconds']}s ({flush['sessionsPerSecond']} sessions/s)")
+
+    # Sessions stopped elsewhere mid-run were not written; don't notify for them.
+    notifications = [n for n in notifications if n["sessionId"] not in conflicts]
+    _log_notifications(notifications)
+    results["notifications"].extend(notifications)
+    return conflicts
+
+
+async def _run_realtime(batch, run_ticks, results, carry, deadline_ms, refresh, station_cache):
+    """
+    Advance `batch` one tick per TICK_INTERVAL_SECONDS of wall-clock time.
+    Each tick's writes are flushed on a worker thread while the loop waits for
+    the next boundary, and the active-session list is re-read in the background
+    to pick up sessions started since. When the deadline leaves no room for
+    the next boundary, the remaining ticks run at once so no time is lost.
+    Returns per-tick drift and latency.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    seen = {state.session_id for state in batch}
+    pending_flush = None
+    pending_refresh = None
+    ticks = []
+
+    for tick in range(TICKS_PER_INVOCATION):
+        target = started + tick * TICK_INTERVAL_SECONDS
+        remaining_ms = _remaining_time_ms(deadline_ms)
+        slowest_ms = max((t["tickMs"] for t in ticks), default=0)
+        wait_ms = max(0.0, target - loop.time()) * 1000
+        catch_up = remaining_ms is not None and remaining_ms - TIME_BUDGET_MARGIN_MS < wait_ms + slowest_ms
+        if catch_up:
+            for state in batch:
+                state.ticks += TICKS_PER_INVOCATION - tick - 1
+        else:
+            await asyncio.sleep(wait_ms / 1000)
+
+        tick_started = loop.time()
+        if pending_refresh is not None:
+            batch = _merge_refresh(batch, await pending_refresh, seen, carry, station_cache, results)
+            pending_refresh = None
+
+        notifications = run_ticks(batch)
+        if pending_flush is not None:
+            conflicts = await pending_flush
+            if conflicts:
+                batch = [s for s in batch if s.session_id not in conflicts]
+                notifications = [n for n in notifications if n["sessionId"] not in conflicts]
+                for session_id in conflicts:
+                    carry.pop(session_id, None)
+        writer = _stage_writes(batch, notifications, results, carry, REALTIME_PERSIST_MIN_CHARGE_DELTA)
+        pending_flush = loop.run_in_executor(None, _flush_writes, writer, notifications, results)
+
+        ticks.append({
+            "tick": tick,
+            "sessions": len(batch),
+            "driftMs": round((tick_started - target) * 1000, 1),
+            "tickMs": round((loop.time() - tick_started) * 1000, 1),
+            "catchUp": catch_up,
+        })
+        batch = [s for s in batch if s.status == "IN_PROGRESS"]
+        for state in batch:
+            state.ticks = 1
+        if catch_up:
+            break
+        if tick + 1 < TICKS_PER_INVOCATION:
+            pending_refresh = loop.run_in_executor(None, refresh, station_cache)
+
+    conflicts = await pending_flush
+    for session_id in conflicts:
+        carry.pop(session_id, None)
+    if pending_refresh is not None:
+        await pending_refresh
+
+    flush_ms = [f["seconds"] * 1000 for f in results["flushes"]]
+    return {
+        "ticks": ticks,
+        "maxDriftMs": max(t["driftMs"] for t in ticks),
+        "maxTickMs": max(t["tickMs"] for t in ticks),
+        "maxFlushMs": round(max(flush_ms, default=0), 1),
+        "keptUp": not any(t["catchUp"] for t in ticks) and all(
+            t["driftMs"] + t["tickMs"] < TICK_INTERVAL_SECONDS * 1000 for t in ticks
+        ) and max(flush_ms, default=0) < TICK_INTERVAL_SECONDS * 1000,
+    }
+
+
+def _merge_refresh(batch, discovered, seen, carry, station_cache, results):
+    """
+    Reconcile the in-memory batch with a fresh read of the active sessions:
+    drop sessions no longer active, add ones started since, and recount
+    active ports per station.
+    """
+    active_sessions, stations, failed_stations = discovered
+    station_cache.update(stations)
+    load_index = _build_station_load_index(active_sessions)
+    active_ids = {session["sessionId"] for session in active_sessions}
+
+    kept = []
+    for state in batch:
+        if state.session_id in active_ids:
+            kept.append(state)
+        else:
+            carry.pop(state.session_id, None)
+    for session in active_sessions:
+        station = station_cache.get(session["stationId"])
+        if session["sessionId"] in seen or not station or session["stationId"] in failed_stations:
+            continue
+        seen.add(session["sessionId"])
+        state = SessionState(session, station, 0)
+        state.ticks = 1
+        kept.append(state)
+        results["sessions"] += 1
+    for state in kept:
+        state.active_ports = len(load_index.get(state.station_id, ())) or state.active_ports
+    return kept
+
+
+def _should_persist(state, now, notified, min_charge_delta=None):
+    """Apply the write policy to a ticked session."""
+    if min_charge_delta is None:
+        min_charge_delta = PERSIST_MIN_CHARGE_DELTA
+    item = state.item
+    if state.status != item["status"] or state.session_id in notified:
+        return True
+    if abs(state.charge_percent - float(item.get("chargePercent", 0))) >= min_charge_delta:
+        return True
+    try:
+        age = (now - datetime.fromisoformat(item["updatedAt"])).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return True
+    return age >= PERSIST_MAX_AGE_SECONDS
+
+
+def _write_units(item):
+    """Approximate write capacity units of a full write of `item` (1 WCU per KB)."""
+    return max(1, math.ceil(_attribute_size(item) / 1024))
+
+
+def _attribute_size(value):
+    """Rough DynamoDB size in bytes of an item or attribute value."""
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode()) + 1 + _attribute_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(1 + _attribute_size(v) for v in value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bool, type(None))):
+        return 1
+    return len(str(value)) // 2 + 1
+
+
+def _remaining_time_ms(deadline_ms):
+    """Milliseconds left until `deadline_ms`, or None when there is no deadline."""
+    if deadline_ms is None:
+        return None
+    return deadline_ms - int(time.time() * 1000)
+
+
+def _load_cursor(buckets):
+    """
+    Load the stations in `buckets` deferred by the previous run, as
+    {"stations": {stationId: owed windows}, "savedAt": iso, "keys": [SK, ...]}.
+    """
+    return _load_record(CURSOR_PK, "stations", int, buckets)
+
+
+def _save_cursor(deferred, previous):
+    """Replace the stored cursor buckets with `deferred` ({stationId: owed windows})."""
+    grouped = {}
+    for station_id, owed in deferred.items():
+        grouped.setdefault(simulator_bucket(station_id), {})[station_id] = owed
+    return _save_record(CURSOR_PK, "stations", grouped, CURSOR_STATIONS_PER_ITEM, previous)
+
+
+def _load_carry_over(buckets):
+    """
+    Load the unpersisted progress of sessions in `buckets` skipped by the write
+    policy, as {"sessions": {sessionId: SessionState.carry_entry()}, "savedAt": iso,
+    "keys": [SK, ...]}.
+    """
+    return _load_record(CARRY_PK, "sessions", list, buckets)
+
+
+def _save_carry_over(carry, previous):
+    """
+    Replace the stored carry-over buckets with `carry`
+    ({sessionId: (stationId, entry)}); returns the write units it took.
+    """
+    grouped = {}
+    for session_id, (station_id, entry) in carry.items():
+        grouped.setdefault(simulator_bucket(station_id), {})[session_id] = entry
+    return _save_record(CARRY_PK, "sessions", grouped, CARRY_SESSIONS_PER_ITEM, previous)
+
+
+def _load_record(pk, field, convert, buckets):
+    """Merge the `field` maps of the BUCKET#bb#CHUNK# items under `pk` for `buckets`."""
+    record = {field: {}, "savedAt": "", "keys": []}
+    try:
+        kwargs = {"KeyConditionExpression": Key("PK").eq(pk)}
+        while True:
+            resp = sessions_table.query(**kwargs)
+            for item in resp.get("Items", []):
+                if int(item["SK"].split("#")[1]) not in buckets:
+                    continue
+                record["keys"].append(item["SK"])
+                record["savedAt"] = max(record["savedAt"], item["savedAt"])
+                record[field].update({k: convert(v) for k, v in item[field].items()})
+            if not resp.get("LastEvaluatedKey"):
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
     except Exception as e:
-        _log_error("charging_simulator", "CRITICAL", f"Simulator failure: {e}")
-        print(f"CRITICAL: Simulator failure: {e}")
-        raise
+        _log_error("charging_simulator", "ERROR", f"Failed to load {pk}: {e}")
+        print(f"Error loading {pk}: {e}")
+    return record
+
+
+def _save_record(pk, field, grouped, per_item, previous):
+    """
+    Store `grouped` ({bucket: {key: value}}) under `pk` as items of `per_item`
+    entries each and delete the chunks of `previous` that were not rewritten.
+    Returns the write units used.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    written = set()
+    units = 0
+    for bucket, mapping in grouped.items():
+        for n, chunk in enumerate(chunked(list(mapping), per_item)):
+            item = {
+                "PK": pk,
+                "SK": f"BUCKET#{bucket:02d}#CHUNK#{n:04d}",
+                "savedAt": now,
+                field: {key: mapping[key] for key in chunk},
+            }
+            sessions_table.put_item(Item=item)
+            written.add(item["SK"])
+            units += _write_units(item)
+
+    for sort_key in previous["keys"]:
+        if sort_key not in written:
+            sessions_table.delete_item(Key={"PK": pk, "SK": sort_key})
+            units += 1
+    return units
 
 
 def calculate_power_factor(charge_percent):
@@ -97,121 +769,689 @@ def calculate_power_factor(charge_percent):
         return 0.3
 
 
-def _simulate_tick(session, station, active_ports_count):
-    """Simulate one 10-second charging tick."""
-    notifications = []
-    charge_percent = float(session.get("chargePercent", 0))
-    energy_consumed = float(session.get("energyConsumedKwh", 0))
-    total_cost = float(session.get("totalCost", 0))
-    tariff = float(session.get("tariffPerKwh", 0))
-    battery_capacity = float(session.get("batteryCapacityKwh", 60))
-    station_power = float(station.get("powerKw", 150))
+def _power_factor_array(charge_percent):
+    """Vectorized calculate_power_factor over an array of charge percentages."""
+    return np.where(charge_percent < 70, 1.0, np.where(charge_percent < 90, 0.6, 0.3))
+
+
+def integrate_charge(charge_percent, battery_capacity, power_kw, seconds):
+    """
+    Advance a session along the charging curve by an arbitrary time span.
+    Power is constant inside each band, so charge grows linearly there and the
+    span is integrated band by band in O(number of bands).
+    Returns (new_percent, energy_added_kwh, seconds_to_80, seconds_to_full);
+    crossing times are None when not reached inside the span.
+    """
+    percent = min(charge_percent, 100.0)
+    elapsed = 0.0
+    seconds_to_80 = None
+
+    for upper, factor in CHARGING_CURVE:
+        if percent >= upper:
+            continue
+        rate = power_kw * factor / battery_capacity * 100 / 3600
+        if rate <= 0:
+            break
+
+        if percent < NOTIFY_CHARGE_PERCENT <= upper:
+            crossing = elapsed + (NOTIFY_CHARGE_PERCENT - percent) / rate
+            if crossing <= seconds:
+                seconds_to_80 = crossing
+
+        to_upper = (upper - percent) / rate
+        if elapsed + to_upper > seconds:
+            percent += rate * (seconds - elapsed)
+            elapsed = seconds
+            break
+        elapsed += to_upper
+        percent = upper
+
+    seconds_to_full = elapsed if percent >= 100 else None
+    energy_added = (percent - charge_percent) * battery_capacity / 100 if percent > charge_percent else 0.0
+    return percent, energy_added, seconds_to_80, seconds_to_full
 
-    old_percent = charge_percent
 
-    if session["status"] == "STARTED":
-        session["status"] = "IN_PROGRESS"
+def _integrate_charge_array(charge_percent, battery_capacity, power_kw, seconds):
+    """Vectorized integrate_charge; crossing times are NaN when not reached."""
+    percent = np.minimum(charge_percent, 100.0)
+    elapsed = np.zeros_like(percent)
+    seconds_to_80 = np.full_like(percent, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for upper, factor in CHARGING_CURVE:
+            rate = power_kw * factor / battery_capacity * 100 / 3600
+            in_band = (percent < upper) & (elapsed < seconds) & (rate > 0)
+
+            crossing = elapsed + (NOTIFY_CHARGE_PERCENT - percent) / rate
+            hits_80 = in_band & (percent < NOTIFY_CHARGE_PERCENT) & (NOTIFY_CHARGE_PERCENT <= upper) & (crossing <= seconds)
+            seconds_to_80 = np.where(hits_80, crossing, seconds_to_80)
+
+            to_upper = (upper - percent) / rate
+            reaches_upper = in_band & (elapsed + to_upper <= seconds)
+            partial = in_band & ~reaches_upper
+            percent = np.where(reaches_upper, upper, np.where(partial, percent + rate * (seconds - elapsed), percent))
+            elapsed = np.where(reaches_upper, elapsed + to_upper, np.where(partial, seconds, elapsed))
+
+    seconds_to_full = np.where(percent >= 100, elapsed, np.nan)
+    energy_added = np.maximum(percent - charge_percent, 0.0) * battery_capacity / 100
+    return percent, energy_added, seconds_to_80, seconds_to_full
+
+
+def _allocate_power(states):
+    """
+    Power available to each charging session for the next tick, before its
+    power factor is applied. Each port's fair share is station power divided
+    by active ports; under "redistribute", sessions still in the full-power
+    band also split whatever the tapering sessions leave unused, so a station
+    never delivers more than its total power.
+    """
+    shares = [s.station_power_kw / max(s.active_ports, 1) for s in states]
+    if POWER_ALLOCATION != "redistribute":
+        return shares
+
+    factors = [calculate_power_factor(s.charge_percent) for s in states]
+    tapered_draw = {}
+    full_count = {}
+    for state, share, factor in zip(states, shares, factors):
+        station_id = state.station_id
+        if factor < 1.0:
+            tapered_draw[station_id] = tapered_draw.get(station_id, 0.0) + share * factor
+        else:
+            full_count[station_id] = full_count.get(station_id, 0) + 1
+
+    return [
+        share if factor < 1.0
+        else (state.station_power_kw - tapered_draw.get(state.station_id, 0.0)) / full_count[state.station_id]
+        for state, share, factor in zip(states, shares, factors)
+    ]
+
+
+def _allocate_power_array(charge, charging, power_per_port, station_power, station_slot, slot_count):
+    """Vectorized _allocate_power for all stations at once; stations are indexed by station_slot."""
+    if POWER_ALLOCATION != "redistribute":
+        return power_per_port
+
+    factor = _power_factor_array(charge)
+    tapered = charging & (factor < 1.0)
+    full = charging & ~tapered
+    tapered_draw = np.bincount(
+        station_slot, weights=np.where(tapered, power_per_port * factor, 0.0), minlength=slot_count
+    )
+    full_count = np.bincount(station_slot, weights=full.astype(np.float64), minlength=slot_count)
+    slot_power = np.zeros(slot_count)
+    slot_power[station_slot] = station_power
+
+    spare_per_full = (slot_power - tapered_draw) / np.maximum(full_count, 1)
+    return np.where(full, spare_per_full[station_slot], power_per_port)
+
+
+def _station_slots(batch):
+    """Dense per-session station index for bincount-based per-station reductions."""
+    slots = {}
+    station_slot = np.fromiter(
+        (slots.setdefault(s.station_id, len(slots)) for s in batch), np.int64, len(batch)
+    )
+    return station_slot, len(slots)
+
+
+class SessionState:
+    """
+    Compact float working state of one session inside the simulator.
+    Decimals are converted only here on load and in to_update on persist;
+    the tick engines work on plain float slots.
+    """
+
+    __slots__ = (
+        "item", "session_id", "user_id", "station_id", "status",
+        "charge_percent", "energy_consumed_kwh", "total_cost",
+        "tariff_per_kwh", "battery_capacity_kwh",
+        "station_power_kw", "active_ports", "ticks", "completed_at",
+    )
+
+    def __init__(self, item, station, active_ports):
+        self.item = item
+        self.session_id = item["sessionId"]
+        self.user_id = item["userId"]
+        self.station_id = item["stationId"]
+        self.status = item["status"]
+        self.charge_percent = float(item.get("chargePercent", 0))
+        self.energy_consumed_kwh = float(item.get("energyConsumedKwh", 0))
+        self.total_cost = float(item.get("totalCost", 0))
+        self.tariff_per_kwh = float(item.get("tariffPerKwh", 0))
+        self.battery_capacity_kwh = float(item.get("batteryCapacityKwh", 60))
+        self.station_power_kw = float(station.get("powerKw", 150))
+        self.active_ports = active_ports
+        self.ticks = TICKS_PER_INVOCATION
+        self.completed_at = None
+
+    def carry_entry(self):
+        """Compact [charge, energy, cost, updatedAt] record of unpersisted progress."""
+        return [
+            Decimal(str(round(self.charge_percent, 2))),
+            Decimal(str(round(self.energy_consumed_kwh, 4))),
+            Decimal(str(round(self.total_cost, 2))),
+            self.item.get("updatedAt", ""),
+        ]
+
+    def restore(self, entry):
+        """Resume from a carry-over entry unless the stored item changed since."""
+        charge, energy, cost, updated_at = entry
+        if updated_at == self.item.get("updatedAt", ""):
+            self.charge_percent = float(charge)
+            self.energy_consumed_kwh = float(energy)
+            self.total_cost = float(cost)
+
+    def to_update(self, now):
+        """
+        Decimal attributes that differ from the loaded item, plus updatedAt.
+        The item is updated in place so it mirrors what was persisted.
+        """
+        attributes = {
+            "status": self.status,
+            "chargePercent": Decimal(str(round(self.charge_percent, 2))),
+            "energyConsumedKwh": Decimal(str(round(self.energy_consumed_kwh, 4))),
+            "totalCost": Decimal(str(round(self.total_cost, 2))),
+        }
+        if self.status == "COMPLETED":
+            attributes["chargePercent"] = Decimal("100")
+            attributes["completedAt"] = self.completed_at or now
+        changes = {k: v for k, v in attributes.items() if self.item.get(k) != v}
+        changes["updatedAt"] = now
+        self.item.update(changes)
+        return changes
+
+
+def _simulate_tick(state, power_kw):
+    """Simulate one 10-second charging tick with `power_kw` allocated to the port."""
+    notifications = []
+    charge_percent = state.charge_percent
+    energy_consumed = state.energy_consumed_kwh
+    total_cost = state.total_cost
+
+    if state.status == "STARTED":
+        state.status = "IN_PROGRESS"
         notifications.append({
             "type": "CHARGING_STARTED",
-            "sessionId": session["sessionId"],
-            "userId": session["userId"],
+            "sessionId": state.session_id,
+            "userId": state.user_id,
         })
 
     interval_hours = TICK_INTERVAL_SECONDS / 3600
-    power_per_port = station_power / max(active_ports_count, 1)
     power_factor = calculate_power_factor(charge_percent)
-    effective_power = power_per_port * power_factor
+    effective_power = power_kw * power_factor
 
     energy_added = effective_power * interval_hours
-    new_percent = min(100.0, charge_percent + (energy_added / battery_capacity) * 100)
-    new_cost = total_cost + energy_added * tariff
+    new_percent = min(100.0, charge_percent + (energy_added / state.battery_capacity_kwh) * 100)
+    new_cost = total_cost + energy_added * state.tariff_per_kwh
 
-    session["chargePercent"] = Decimal(str(round(new_percent, 2)))
-    session["energyConsumedKwh"] = Decimal(str(round(energy_consumed + energy_added, 4)))
-    session["totalCost"] = Decimal(str(round(new_cost, 2)))
-    session["updatedAt"] = datetime.now(timezone.utc).isoformat()
+    state.charge_percent = new_percent
+    state.energy_consumed_kwh = energy_consumed + energy_added
+    state.total_cost = new_cost
 
-    if old_percent < 80 and new_percent >= 80:
+    if charge_percent < 80 and new_percent >= 80:
         notifications.append({
             "type": "CHARGE_80_PERCENT",
-            "sessionId": session["sessionId"],
-            "userId": session["userId"],
+            "sessionId": state.session_id,
+            "userId": state.user_id,
             "chargePercent": round(new_percent, 2),
         })
 
     if new_percent >= 100:
-        session["status"] = "COMPLETED"
-        session["chargePercent"] = Decimal("100")
-        session["completedAt"] = datetime.now(timezone.utc).isoformat()
+        state.status = "COMPLETED"
         notifications.append({
             "type": "CHARGING_COMPLETED",
-            "sessionId": session["sessionId"],
-            "userId": session["userId"],
+            "sessionId": state.session_id,
+            "userId": state.user_id,
             "totalCost": round(new_cost, 2),
             "energyConsumedKwh": round(energy_consumed + energy_added, 4),
         })
 
-    return session, notifications
+    return state, notifications
+
+
+def _run_reference_ticks(batch):
+    """
+    Reference engine: advance sessions tick by tick in pure Python, each for
+    its own number of ticks. Power is re-allocated across each station
+    before every tick.
+    """
+    notifications = [[] for _ in batch]
+    charging = list(range(len(batch)))
+    for tick in range(max((s.ticks for s in batch), default=0)):
+        ticking = [i for i in charging if tick < batch[i].ticks]
+        if not ticking:
+            break
+        states = [batch[i] for i in ticking]
+        for i, state, power_kw in zip(ticking, states, _allocate_power(states)):
+            state, tick_notifications = _simulate_tick(state, power_kw)
+            notifications[i].extend(tick_notifications)
+        charging = [i for i in charging if batch[i].status not in ("COMPLETED", "FAILED")]
+
+    return [n for session_notifications in notifications for n in session_notifications]
 
 
-def _get_active_sessions():
-    """Fetch all sessions with STARTED or IN_PROGRESS status."""
-    results = []
-    for status in ("STARTED", "IN_PROGRESS"):
-        resp = sessions_table.query(
-            IndexName="status-index",
-            KeyConditionExpression=Key("status").eq(status),
+def _run_vectorized_ticks(batch):
+    """
+    Batch engine: advance every session in one NumPy pass per tick.
+    Uses the same float arithmetic as _simulate_tick, so both engines
+    produce identical states and notifications.
+    """
+    if not batch:
+        return []
+
+    size = len(batch)
+    charge = np.fromiter((s.charge_percent for s in batch), np.float64, size)
+    energy = np.fromiter((s.energy_consumed_kwh for s in batch), np.float64, size)
+    cost = np.fromiter((s.total_cost for s in batch), np.float64, size)
+    tariff = np.fromiter((s.tariff_per_kwh for s in batch), np.float64, size)
+    capacity = np.fromiter((s.battery_capacity_kwh for s in batch), np.float64, size)
+    station_power = np.fromiter((s.station_power_kw for s in batch), np.float64, size)
+    active_ports = np.fromiter((s.active_ports for s in batch), np.int64, size)
+    ticks = np.fromiter((s.ticks for s in batch), np.int64, size)
+
+    interval_hours = TICK_INTERVAL_SECONDS / 3600
+    power_per_port = station_power / np.maximum(active_ports, 1)
+    station_slot, slot_count = _station_slots(batch)
+    charging = np.ones(size, dtype=bool)
+    crossed_80 = np.full(size, np.nan)
+
+    for tick in range(int(ticks.max())):
+        ticking = charging & (tick < ticks)
+        if not ticking.any():
+            break
+        allocated = _allocate_power_array(
+            charge, ticking, power_per_port, station_power, station_slot, slot_count
         )
-        results.extend(resp.get("Items", []))
-    return results
+        effective_power = allocated * _power_factor_array(charge)
+        energy_added = effective_power * interval_hours
+        new_charge = np.minimum(100.0, charge + (energy_added / capacity) * 100)
+
+        crossed = ticking & (charge < 80) & (new_charge >= 80)
+        crossed_80[crossed] = new_charge[crossed]
 
+        cost = np.where(ticking, cost + energy_added * tariff, cost)
+        energy = np.where(ticking, energy + energy_added, energy)
+        charge = np.where(ticking, new_charge, charge)
+        charging &= ~(ticking & (new_charge >= 100))
 
-def _get_station_data(station_id):
-    """Fetch station metadata."""
-    resp = stations_table.get_item(
-        Key={"PK": f"STATION#{station_id}", "SK": "METADATA"}
+    notifications = []
+    for i, state in enumerate(batch):
+        if state.status == "STARTED":
+            state.status = "IN_PROGRESS"
+            notifications.append({
+                "type": "CHARGING_STARTED",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+            })
+
+        state.charge_percent = float(charge[i])
+        state.energy_consumed_kwh = float(energy[i])
+        state.total_cost = float(cost[i])
+
+        if not np.isnan(crossed_80[i]):
+            notifications.append({
+                "type": "CHARGE_80_PERCENT",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+                "chargePercent": round(float(crossed_80[i]), 2),
+            })
+
+        if not charging[i]:
+            state.status = "COMPLETED"
+            notifications.append({
+                "type": "CHARGING_COMPLETED",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+                "totalCost": round(state.total_cost, 2),
+                "energyConsumedKwh": round(state.energy_consumed_kwh, 4),
+            })
+
+    return notifications
+
+
+def _run_analytic_ticks(batch):
+    """
+    Analytic engine: integrate the whole simulation window in closed form and
+    timestamp the 80% and completion crossings where they actually happen.
+    """
+    if not batch:
+        return []
+
+    size = len(batch)
+    now = datetime.now(timezone.utc)
+    charge = np.fromiter((s.charge_percent for s in batch), np.float64, size)
+    capacity = np.fromiter((s.battery_capacity_kwh for s in batch), np.float64, size)
+    station_power = np.fromiter((s.station_power_kw for s in batch), np.float64, size)
+    active_ports = np.fromiter((s.active_ports for s in batch), np.int64, size)
+    window_seconds = np.fromiter((s.ticks for s in batch), np.float64, size) * TICK_INTERVAL_SECONDS
+
+    # Allocation is fixed at the start of the window; the curve itself is
+    # integrated exactly from there.
+    power_per_port = station_power / np.maximum(active_ports, 1)
+    station_slot, slot_count = _station_slots(batch)
+    allocated = _allocate_power_array(
+        charge, np.ones(size, dtype=bool), power_per_port, station_power, station_slot, slot_count
+    )
+    new_charge, energy_added, seconds_to_80, seconds_to_full = _integrate_charge_array(
+        charge, capacity, allocated, window_seconds
     )
-    return resp.get("Item")
 
+    notifications = []
+    for i, state in enumerate(batch):
+        if state.status == "STARTED":
+            state.status = "IN_PROGRESS"
+            notifications.append({
+                "type": "CHARGING_STARTED",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+            })
 
-def _count_active_ports_on_station(station_id, all_active_sessions):
-    """Count how many active sessions are on a given station."""
-    return sum(1 for s in all_active_sessions if s["stationId"] == station_id)
+        # Whole windows owed from a deferred run come on top of the current
+        # window's ticks (6 in batch mode, 1 per real-time tick) and start that much earlier.
+        current_ticks = (state.ticks - 1) % TICKS_PER_INVOCATION + 1
+        window_start = now - timedelta(seconds=float(window_seconds[i]) - current_ticks * TICK_INTERVAL_SECONDS)
+        added = float(energy_added[i])
+        state.charge_percent = float(new_charge[i])
+        state.energy_consumed_kwh += added
+        state.total_cost += added * state.tariff_per_kwh
 
+        if not np.isnan(seconds_to_80[i]):
+            notifications.append({
+                "type": "CHARGE_80_PERCENT",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+                "chargePercent": NOTIFY_CHARGE_PERCENT,
+                "reachedAt": (window_start + timedelta(seconds=float(seconds_to_80[i]))).isoformat(),
+            })
 
-def _save_session(session):
-    """Persist updated session back to DynamoDB."""
-    sessions_table.put_item(Item=session)
+        if not np.isnan(seconds_to_full[i]):
+            state.status = "COMPLETED"
+            state.completed_at = (window_start + timedelta(seconds=float(seconds_to_full[i]))).isoformat()
+            notifications.append({
+                "type": "CHARGING_COMPLETED",
+                "sessionId": state.session_id,
+                "userId": state.user_id,
+                "totalCost": round(state.total_cost, 2),
+                "energyConsumedKwh": round(state.energy_consumed_kwh, 4),
+            })
 
+    return notifications
 
-def _free_port(station_id, port_id):
-    """Set port status back to FREE after session completes."""
-    stations_table.update_item(
-        Key={"PK": f"STATION#{station_id}", "SK": f"PORT#{port_id}"},
-        UpdateExpression="SET #status = :status, updatedAt = :now",
-        ExpressionAttributeNames={"#status": "status"},
-        ExpressionAttributeValues={
-            ":status": "FREE",
-            ":now": datetime.now(timezone.utc).isoformat(),
-        },
+
+TICK_ENGINES = {
+    "reference": _run_reference_ticks,
+    "vectorized": _run_vectorized_ticks,
+    "analytic": _run_analytic_ticks,
+}
+
+
+def _iter_active_session_pages():
+    """
+    Stream pages of active sessions. One worker per status follows
+    LastEvaluatedKey to the end of the status-index partition; pages are
+    yielded in arrival order while the other queries keep fetching.
+    """
+    pages = queue.Queue()
+    with ThreadPoolExecutor(max_workers=len(ACTIVE_SESSION_STATUSES)) as pool:
+        for status in ACTIVE_SESSION_STATUSES:
+            pool.submit(_query_status_pages, status, pages)
+
+        pending = len(ACTIVE_SESSION_STATUSES)
+        while pending:
+            page = pages.get()
+            if page is None:
+                pending -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+
+
+def _query_status_pages(status, pages):
+    """Push every status-index page for one status onto the queue, then a None sentinel."""
+    kwargs = {
+        "IndexName": "status-index",
+        "KeyConditionExpression": Key("status").eq(status),
+    }
+    try:
+        while True:
+            resp = sessions_table.query(**kwargs)
+            pages.put(resp.get("Items", []))
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+    except Exception as e:
+        pages.put(e)
+    finally:
+        pages.put(None)
+
+
+def _fetch_stations(station_ids):
+    """
+    Station METADATA for `station_ids` through the shared BatchGetItem helper:
+    ({stationId: item or None if missing}, {stationId: error}).
+    """
+    result = batch_get_items(
+        stations_table, [{"PK": f"STATION#{station_id}", "SK": "METADATA"} for station_id in station_ids]
     )
+    failed = {pk.split("#", 1)[1]: error for (pk, _), error in result["failed"].items()}
+    stations = {station_id: None for station_id in station_ids if station_id not in failed}
+    for station in result["items"].values():
+        stations[station["stationId"]] = station
+        station_metadata_cache.put(station["stationId"], station)
+    return stations, failed
 
+def _build_station_load_index(active_sessions):
+    """
+    Map stationId -> list of its active sessions, built once per invocation.
+    The list length is the active-port count used for power sharing.
+    """
+    load_index = {}
+    for session in active_sessions:
+        load_index.setdefault(session["stationId"], []).append(session)
+    return load_index
 
-def _log_notification(notification):
-    """Log notification to ErrorLogs table (mock SNS)."""
-    error_logs_table.put_item(
-        Item={
+
+class SessionWriter:
+    """
+    Buffers simulator writes and flushes them as parallel chunks on a bounded
+    thread pool. Only changed attributes are written, guarded by the stored
+    status still being STARTED or IN_PROGRESS, so a session a user stopped in
+    the meantime is never flipped back: in-progress sessions go out as
+    conditional UpdateItem calls, completed sessions as TransactWriteItems
+    that also free the port and move the station's port counters. Failed
+    guards are counted as conflicts and skipped.
+    """
+
+    def __init__(self, max_workers=WRITE_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._saves = []
+        self._completions = []
+
+    def save(self, session, changes):
+        self._saves.append((session, changes))
+
+    def complete(self, session, changes):
+        self._completions.append((session, changes))
+
+    def flush(self):
+        """Write everything buffered; returns counts, conflicting sessionIds, failures and throughput."""
+        started = time.perf_counter()
+        chunks = [(_update_sessions, "updated", chunk)
+                  for chunk in chunked(self._saves, WRITE_BATCH_SIZE)]
+        chunks += [(_write_completion_transaction, "completed", chunk)
+                   for chunk in chunked(self._completions, TRANSACT_MAX_ACTIONS // 3)]
+        self._saves, self._completions = [], []
+
+        stats = {"updated": 0, "completed": 0, "conflicts": [], "failed": {}, "requests": 0}
+        if chunks:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [(pool.submit(write, chunk), kind, chunk) for write, kind, chunk in chunks]
+                for future, kind, chunk in futures:
+                    try:
+                        requests, failed, conflicts = future.result()
+                    except Exception as e:
+                        requests, failed, conflicts = 1, {s["sessionId"]: str(e) for s, _ in chunk}, []
+                    stats["requests"] += requests
+                    stats["failed"].update(failed)
+                    stats["conflicts"].extend(conflicts)
+                    stats[kind] += len(chunk) - len(failed) - len(conflicts)
+
+        elapsed = time.perf_counter() - started
+        written = stats["updated"] + stats["completed"]
+        stats["sessions"] = written
+        stats["seconds"] = round(elapsed, 3)
+        stats["sessionsPerSecond"] = round(written / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+
+
+def _session_update(session, changes):
+    """UpdateItem parameters that SET `changes` only while the session is still active."""
+    names = {"#status": "status"}
+    values = {":started": {"S": "STARTED"}, ":in_progress": {"S": "IN_PROGRESS"}}
+    assignments = []
+    for n, (attribute, value) in enumerate(changes.items()):
+        names[f"#a{n}"] = attribute
+        values[f":v{n}"] = serializer.serialize(value)
+        assignments.append(f"#a{n} = :v{n}")
+    return {
+        "TableName": SESSIONS_TABLE,
+        "Key": {"PK": {"S": session["PK"]}, "SK": {"S": session["SK"]}},
+        "UpdateExpression": "SET " + ", ".join(assignments),
+        "ConditionExpression": "#status IN (:started, :in_progress)",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def _update_sessions(updates):
+    """Apply a chunk of conditional session updates, retrying throttles with backoff."""
+    requests = 0
+    failed = {}
+    conflicts = []
+    for session, changes in updates:
+        params = _session_update(session, changes)
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                backoff(attempt)
+            requests += 1
+            try:
+                dynamodb_client.update_item(**params)
+                break
+            except ClientError as e:
+                code = e.response["Error"]["Code"]
+                if code == "ConditionalCheckFailedException":
+                    conflicts.append(session["sessionId"])
+                    break
+                if code not in TRANSACTION_RETRYABLE_ERROR_CODES:
+                    failed[session["sessionId"]] = str(e)
+                    break
+                error = str(e)
+        else:
+            failed[session["sessionId"]] = error
+    return requests, failed, conflicts
+
+
+def _write_completion_transaction(completions):
+    """
+    Complete sessions, free their ports and shift the stations' port counters
+    in one TransactWriteItems call. Sessions whose status guard fails are
+    dropped and the rest retried at once; a port that is no longer CHARGING
+    is left as it is and its session completed without it.
+    """
+    pending = list(completions)
+    skipped = set()
+    conflicts = []
+    requests = 0
+    attempt = 0
+    error = None
+    while pending and attempt < BATCH_MAX_ATTEMPTS:
+        actions, owners = _completion_actions(pending, skipped)
+        requests += 1
+        try:
+            dynamodb_client.transact_write_items(TransactItems=actions)
+            return requests, {}, conflicts
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in TRANSACTION_RETRYABLE_ERROR_CODES:
+                raise
+            reasons = e.response.get("CancellationReasons") or []
+            rejected = [owners[i] for i, r in enumerate(reasons) if r.get("Code") == "ConditionalCheckFailed"]
+            if rejected:
+                rejected_sessions = {session_id for kind, session_id in rejected if kind == "session"}
+                skipped.update(owner for owner in rejected if owner[0] != "session")
+                conflicts.extend(sorted(rejected_sessions))
+                pending = [p for p in pending if p[0]["sessionId"] not in rejected_sessions]
+                continue
+            error = str(e)
+            attempt += 1
+            backoff(attempt)
+
+    return requests, {s["sessionId"]: error for s, _ in pending}, conflicts
+
+
+def _completion_actions(pending, skipped):
+    """
+    Transaction actions for a chunk of completions and, per action, the
+    ("session" | "port" | "station", id) it belongs to; owners in `skipped`
+    get no action. Counter changes are summed per station, since a
+    transaction may touch each item only once.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    actions, owners = [], []
+    freed = {}
+    for session, changes in pending:
+        session_id = session["sessionId"]
+        actions.append({"Update": _session_update(session, changes)})
+        owners.append(("session", session_id))
+        if ("port", session_id) in skipped:
+            continue
+        port_update, _ = port_status_actions(
+            STATIONS_TABLE, session["stationId"], session["portId"], "CHARGING", "FREE", now
+        )
+        actions.append(_serialize_action(port_update))
+        owners.append(("port", session_id))
+        freed[session["stationId"]] = freed.get(session["stationId"], 0) + 1
+    for station_id, count in freed.items():
+        if ("station", station_id) in skipped:
+            continue
+        actions.append(_serialize_action(
+            port_counter_action(STATIONS_TABLE, station_id, {"CHARGING": -count, "FREE": count})
+        ))
+        owners.append(("station", station_id))
+    return actions, owners
+
+
+def _serialize_action(action):
+    """Convert a plain-valued transaction action into DynamoDB JSON for the low-level client."""
+    (kind, params), = action.items()
+    params = dict(params, Key={k: serializer.serialize(v) for k, v in params["Key"].items()})
+    if "ExpressionAttributeValues" in params:
+        params["ExpressionAttributeValues"] = {
+            k: serializer.serialize(v) for k, v in params["ExpressionAttributeValues"].items()
+        }
+    return {kind: params}
+
+
+def _log_notifications(notifications):
+    """Log notifications to the ErrorLogs table (mock SNS) with batched writes."""
+    now = datetime.now(timezone.utc).isoformat()
+    written = batch_put_items(error_logs_table, [
+        {
             "PK": f"NOTIFICATION#{uuid.uuid4()}",
-            "SK": datetime.now(timezone.utc).isoformat(),
+            "SK": now,
             "errorId": str(uuid.uuid4()),
             "service": "notification_service",
             "level": "INFO",
             "logStatus": "NEW",
             "message": f"[{notification['type']}] Session {notification['sessionId']}",
             "details": json.dumps(notification, default=str),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now,
         }
-    )
+        for notification in notifications
+    ])
+    for key, error in written["failed"].items():
+        print(f"Error logging notification {key[0]}: {error}")
 
 
 def _log_error(service, level, message, session_id=None):
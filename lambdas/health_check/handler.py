@@ -8,13 +8,15 @@ import json
 import time
 from datetime import datetime, timezone
 
-import boto3
+from shared.db import get_dynamodb_resource
+from shared.logger import log_db_usage
 
 STATIONS_TABLE = os.environ.get("STATIONS_TABLE", "Stations")
 SESSIONS_TABLE = os.environ.get("SESSIONS_TABLE", "Sessions")
 REGION = os.environ.get("AWS_REGION_NAME", "us-east-1")
 
 
+@log_db_usage("health_check")
 def lambda_handler(event, context):
     """Проверяет доступность Lambda и DynamoDB."""
     start = time.time()
@@ -28,8 +30,7 @@ def lambda_handler(event, context):
     }
 
     try:
-        dynamodb = boto3.resource("dynamodb", region_name=REGION)
-        table = dynamodb.Table(STATIONS_TABLE)
+        table = get_dynamodb_resource(REGION).Table(STATIONS_TABLE)
         table.table_status
         checks["dynamodb"] = {
             "status": "ok",
@@ -43,8 +44,7 @@ def lambda_handler(event, context):
         }
 
     try:
-        dynamodb = boto3.resource("dynamodb", region_name=REGION)
-        table = dynamodb.Table(STATIONS_TABLE)
+        table = get_dynamodb_resource(REGION).Table(STATIONS_TABLE)
         response = table.scan(
             FilterExpression="SK = :sk",
             ExpressionAttributeValues={":sk": "METADATA"},
@@ -11,12 +11,15 @@ from datetime import datetime, timezone
 
 import boto3
 
+from shared.db import batch_put_items, get_dynamodb_resource
+from shared.logger import log_db_usage
+
 ERROR_LOGS_TABLE = os.environ.get("ERROR_LOGS_TABLE", "ErrorLogs")
 REGION = os.environ.get("AWS_REGION_NAME", "us-east-1")
 SNS_ENABLED = os.environ.get("SNS_ENABLED", "false").lower() == "true"
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN", "")
 
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
+dynamodb = get_dynamodb_resource(REGION)
 error_logs_table = dynamodb.Table(ERROR_LOGS_TABLE)
 
 NOTIFICATION_TEMPLATES = {
@@ -28,6 +31,7 @@ NOTIFICATION_TEMPLATES = {
 }
 
 
+@log_db_usage("notification_service")
 def lambda_handler(event, context):
     """Handle notification requests."""
     action = event.get("action", "send")
@@ -43,6 +47,32 @@ def lambda_handler(event, context):
 def handle_send(event):
     """Send a single notification."""
     notification = event.get("notification", {})
+    notif_type, log_item = _deliver(notification)
+    if log_item:
+        error_logs_table.put_item(Item=log_item)
+    return _response(200, {"message": "Notification sent", "type": notif_type})
+
+
+def handle_batch_send(event):
+    """Send multiple notifications, logging them with batched writes."""
+    notifications = event.get("notifications", [])
+    log_items = []
+    for notif in notifications:
+        _, log_item = _deliver(notif)
+        if log_item:
+            log_items.append(log_item)
+
+    written = batch_put_items(error_logs_table, log_items)
+    if written["failed"]:
+        print(f"Failed to log {len(written['failed'])} notifications: {written['failed']}")
+    return _response(200, {"sent": len(notifications), "failed": len(written["failed"])})
+
+
+def _deliver(notification):
+    """
+    Send a notification through SNS, or build its ErrorLogs item when SNS is
+    disabled. Returns (type, log item or None).
+    """
     notif_type = notification.get("type", "UNKNOWN")
     user_id = notification.get("userId", "unknown")
     session_id = notification.get("sessionId", "unknown")
@@ -50,23 +80,14 @@ def handle_send(event):
     template = NOTIFICATION_TEMPLATES.get(notif_type, "Notification: {type}")
     message = template.format(**{**notification, "type": notif_type})
 
+    log_item = None
     if SNS_ENABLED and SNS_TOPIC_ARN:
         _send_sns(user_id, message)
     else:
-        _log_notification(notif_type, user_id, session_id, message, notification)
+        log_item = _notification_log_item(notif_type, user_id, session_id, message, notification)
 
     print(f"Notification sent: [{notif_type}] to user {user_id}")
-    return _response(200, {"message": "Notification sent", "type": notif_type})
-
-
-def handle_batch_send(event):
-    """Send multiple notifications."""
-    notifications = event.get("notifications", [])
-    results = []
-    for notif in notifications:
-        result = handle_send({"notification": notif})
-        results.append(result)
-    return _response(200, {"sent": len(results)})
+    return notif_type, log_item
 
 
 def _send_sns(user_id, message):
@@ -82,25 +103,23 @@ def _send_sns(user_id, message):
     )
 
 
-def _log_notification(notif_type, user_id, session_id, message, details):
-    """Log notification to DynamoDB (mock SNS for development)."""
+def _notification_log_item(notif_type, user_id, session_id, message, details):
+    """ErrorLogs item for a notification (mock SNS for development)."""
     now = datetime.now(timezone.utc).isoformat()
-    error_logs_table.put_item(
-        Item={
-            "PK": f"NOTIFICATION#{uuid.uuid4()}",
-            "SK": now,
-            "errorId": str(uuid.uuid4()),
-            "service": "notification_service",
-            "level": "INFO",
-            "logStatus": "NEW",
-            "message": f"[{notif_type}] User {user_id}: {message}",
-            "details": json.dumps(
-                {"type": notif_type, "userId": user_id, "sessionId": session_id, **details},
-                default=str,
-            ),
-            "timestamp": now,
-        }
-    )
+    return {
+        "PK": f"NOTIFICATION#{uuid.uuid4()}",
+        "SK": now,
+        "errorId": str(uuid.uuid4()),
+        "service": "notification_service",
+        "level": "INFO",
+        "logStatus": "NEW",
+        "message": f"[{notif_type}] User {user_id}: {message}",
+        "details": json.dumps(
+            {"type": notif_type, "userId": user_id, "sessionId": session_id, **details},
+            default=str,
+        ),
+        "timestamp": now,
+    }
 
 
 def _response(status_code, body):
@@ -8,18 +8,25 @@ import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
 
-import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from shared.db import (
+    get_carried_progress, get_carried_progress_many, get_dynamodb_resource, parallel_scan, port_status_actions,
+)
+from shared.logger import log_db_usage
 
 SESSIONS_TABLE = os.environ.get("SESSIONS_TABLE", "Sessions")
 STATIONS_TABLE = os.environ.get("STATIONS_TABLE", "Stations")
 REGION = os.environ.get("AWS_REGION_NAME", "us-east-1")
+PORT_UPDATE_ATTEMPTS = 3
 
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
+dynamodb = get_dynamodb_resource(REGION)
 sessions_table = dynamodb.Table(SESSIONS_TABLE)
 stations_table = dynamodb.Table(STATIONS_TABLE)
 
 
+@log_db_usage("session_service")
 def lambda_handler(event, context):
     action = event.get("action")
     handlers = {
@@ -48,10 +55,11 @@ def handle_start(event):
     port_id = event["portId"]
     battery_capacity = event.get("batteryCapacityKwh", 60)
 
-    station_resp = stations_table.get_item(
-        Key={"PK": f"STATION#{station_id}", "SK": "METADATA"}
-    )
-    station = station_resp.get("Item")
+    # Admission and the tariff the session is billed at come from a fresh,
+    # strongly consistent read: another process may have just changed either.
+    station = stations_table.get_item(
+        Key={"PK": f"STATION#{station_id}", "SK": "METADATA"}, ConsistentRead=True
+    ).get("Item")
     if not station or station["status"] != "ACTIVE":
         return _response(400, {"error": "Station is not active"})
 
@@ -92,57 +100,107 @@ def handle_start(event):
         "createdAt": now,
         "updatedAt": now,
     }
-    sessions_table.put_item(Item=session_item)
-
-    stations_table.update_item(
-        Key={"PK": f"STATION#{station_id}", "SK": f"PORT#{port_id}"},
-        UpdateExpression="SET #status = :status, updatedAt = :now",
-        ExpressionAttributeNames={"#status": "status"},
-        ExpressionAttributeValues={":status": "CHARGING", ":now": now},
-    )
+    # The session, the port and the station's port counters change together;
+    # the port guard also stops two users taking the same port.
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            {"Put": {
+                "TableName": sessions_table.name,
+                "Item": session_item,
+                "ConditionExpression": "attribute_not_exists(PK)",
+            }},
+            *port_status_actions(stations_table.name, station_id, port_id, "FREE", "CHARGING", now),
+        ])
+    except ClientError as e:
+        if 1 in _failed_conditions(e):
+            return _response(409, {"error": f"Port {port_id} is not free"})
+        raise
 
     return _response(201, {"session": _format_session(session_item)})
 
 
 def handle_stop(event):
+    """
+    Interrupt an active session and free its port. Progress the simulator
+    computed but has not written yet (its carry-over) is billed as well; the
+    session, the carry-over chunk and the port are read again if any of them
+    changes before the write.
+    """
     session_id = event["sessionId"]
     user_id = event.get("userId")
     force = event.get("force", False)
 
-    resp = sessions_table.get_item(
-        Key={"PK": f"SESSION#{session_id}", "SK": "METADATA"}
-    )
-    session = resp.get("Item")
-    if not session:
-        return _response(404, {"error": "Session not found"})
-
-    if not force and session["userId"] != user_id:
-        return _response(403, {"error": "Cannot stop another user's session"})
+    for attempt in range(PORT_UPDATE_ATTEMPTS):
+        session = sessions_table.get_item(
+            Key={"PK": f"SESSION#{session_id}", "SK": "METADATA"}
+        ).get("Item")
+        if not session:
+            return _response(404, {"error": "Session not found"})
+
+        if not force and session["userId"] != user_id:
+            return _response(403, {"error": "Cannot stop another user's session"})
+
+        if session["status"] not in ("STARTED", "IN_PROGRESS"):
+            if attempt:
+                return _response(409, {"error": "Session is no longer active"})
+            return _response(400, {"error": f"Session is {session['status']}"})
+
+        now = datetime.now(timezone.utc).isoformat()
+        station_id, port_id = session["stationId"], session["portId"]
+        actions = _stop_actions(session, now)
+        port = stations_table.get_item(
+            Key={"PK": f"STATION#{station_id}", "SK": f"PORT#{port_id}"}
+        ).get("Item")
+        if port and port["status"] != "FREE":
+            actions += port_status_actions(stations_table.name, station_id, port_id, port["status"], "FREE", now)
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=actions)
+            break
+        except ClientError as e:
+            if not _failed_conditions(e):
+                raise
+    else:
+        return _response(409, {"error": f"Session {session_id} is changing, try again"})
 
-    if session["status"] not in ("STARTED", "IN_PROGRESS"):
-        return _response(400, {"error": f"Session is {session['status']}"})
+    return _response(200, {"session": _format_session(session)})
 
-    now = datetime.now(timezone.utc).isoformat()
-    sessions_table.update_item(
-        Key={"PK": f"SESSION#{session_id}", "SK": "METADATA"},
-        UpdateExpression="SET #status = :status, updatedAt = :now, completedAt = :now",
-        ExpressionAttributeNames={"#status": "status"},
-        ExpressionAttributeValues={":status": "INTERRUPTED", ":now": now},
-    )
 
-    stations_table.update_item(
-        Key={
-            "PK": f"STATION#{session['stationId']}",
-            "SK": f"PORT#{session['portId']}",
+def _stop_actions(session, now):
+    """
+    Transaction actions interrupting `session` (updated in place to match):
+    the guarded session update, plus a check that the simulator's carry-over
+    chunk it merged is still the one it read.
+    """
+    changes = {"status": "INTERRUPTED", "updatedAt": now, "completedAt": now}
+    actions = []
+    carried = get_carried_progress(sessions_table, session["stationId"], session["sessionId"])
+    # A carry entry computed from an older copy of the session is superseded
+    # by what the simulator has written since.
+    if carried and carried[0][3] == session.get("updatedAt", ""):
+        (charge, energy, cost, _), item = carried
+        changes.update(chargePercent=charge, energyConsumedKwh=energy, totalCost=cost)
+        actions.append({"ConditionCheck": {
+            "TableName": sessions_table.name,
+            "Key": {"PK": item["PK"], "SK": item["SK"]},
+            "ConditionExpression": "savedAt = :saved",
+            "ExpressionAttributeValues": {":saved": item["savedAt"]},
+        }})
+
+    names = {f"#a{n}": name for n, name in enumerate(changes)}
+    values = {f":v{n}": value for n, value in enumerate(changes.values())}
+    actions.insert(0, {"Update": {
+        "TableName": sessions_table.name,
+        "Key": {"PK": session["PK"], "SK": "METADATA"},
+        "UpdateExpression": "SET " + ", ".join(f"{n} = {v}" for n, v in zip(names, values)),
+        "ConditionExpression": "#a0 IN (:started, :in_progress) AND updatedAt = :seen",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": {
+            **values, ":started": "STARTED", ":in_progress": "IN_PROGRESS",
+            ":seen": session.get("updatedAt", ""),
         },
-        UpdateExpression="SET #status = :status, updatedAt = :now",
-        ExpressionAttributeNames={"#status": "status"},
-        ExpressionAttributeValues={":status": "FREE", ":now": now},
-    )
-
-    session["status"] = "INTERRUPTED"
-    session["completedAt"] = now
-    return _response(200, {"session": _format_session(session)})
+    }})
+    session.update(changes)
+    return actions
 
 
 def handle_get(event):
@@ -153,6 +211,7 @@ def handle_get(event):
     item = resp.get("Item")
     if not item:
         return _response(404, {"error": "Session not found"})
+    _merge_carried_progress([item])
     return _response(200, {"session": _format_session(item)})
 
 
@@ -167,6 +226,8 @@ def handle_get_active(event):
         (s for s in resp.get("Items", []) if s["status"] in ("STARTED", "IN_PROGRESS")),
         None,
     )
+    if active:
+        _merge_carried_progress([active])
     return _response(200, {"session": _format_session(active) if active else None})
 
 
@@ -177,7 +238,8 @@ def handle_history(event):
         KeyConditionExpression=Key("userId").eq(user_id),
         ScanIndexForward=False,
     )
-    sessions = [_format_session(s) for s in resp.get("Items", [])]
+    items = _merge_carried_progress(resp.get("Items", []))
+    sessions = [_format_session(s) for s in items]
     return _response(200, {"sessions": sessions})
 
 
@@ -189,15 +251,37 @@ def handle_list_all(event):
             KeyConditionExpression=Key("status").eq(status_filter),
             ScanIndexForward=False,
         )
+        items = resp.get("Items", [])
     else:
-        resp = sessions_table.scan(
-            FilterExpression="SK = :sk",
-            ExpressionAttributeValues={":sk": "METADATA"},
-        )
-    sessions = [_format_session(s) for s in resp.get("Items", [])]
+        items = parallel_scan(sessions_table, filter_expression=Attr("SK").eq("METADATA"))
+    sessions = [_format_session(s) for s in _merge_carried_progress(list(items))]
     return _response(200, {"sessions": sessions})
 
 
+def _merge_carried_progress(items):
+    """
+    Overlay the progress the simulator computed but has not written yet (its
+    carry-over) onto the active sessions among `items`, in place, so reads
+    do not lag behind by the write policy's thresholds. An entry computed
+    from an older copy of a session is ignored, as in handle_stop.
+    """
+    active = [item for item in items if item["status"] in ("STARTED", "IN_PROGRESS")]
+    progress = get_carried_progress_many(sessions_table, active) if active else {}
+    for item in active:
+        entry = progress.get(item["sessionId"])
+        if entry and entry[3] == item.get("updatedAt", ""):
+            item.update(chargePercent=entry[0], energyConsumedKwh=entry[1], totalCost=entry[2])
+    return items
+
+
+def _failed_conditions(error):
+    """Positions of the transaction actions whose condition check failed."""
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return set()
+    reasons = error.response.get("CancellationReasons") or []
+    return {i for i, reason in enumerate(reasons) if reason.get("Code") == "ConditionalCheckFailed"}
+
+
 def _format_session(item):
     return {
         "sessionId": item["sessionId"],
@@ -3,7 +3,7 @@
 from .models import (
     StationStatus, PortStatus, SessionStatus, ErrorLogStatus, LogLevel, UserRole,
     STATION_TRANSITIONS, PORT_TRANSITIONS, SESSION_TRANSITIONS, ERROR_LOG_TRANSITIONS,
-    validate_transition,
+    PORT_COUNTER_ATTRIBUTES, validate_transition, initial_port_counters,
     Station, ChargingPort, ChargingSession, ErrorLog,
 )
 from .exceptions import (
@@ -11,7 +11,15 @@ from .exceptions import (
     ForbiddenError, InvalidTransitionError,
 )
 from .db import (
+    get_dynamodb_resource, get_dynamodb_client, get_pool_stats,
     get_stations_table, get_sessions_table, get_users_table, get_error_logs_table,
     put_item, get_item, query_pk, query_gsi, update_item, delete_item,
+    iter_query_pk, iter_query_gsi, iter_scan_table, ItemStream, parallel_scan,
+    batch_get_items, batch_put_items, batch_delete_items, chunked, backoff,
+    port_status_actions, port_counter_action,
+    SIMULATOR_BUCKETS, SIMULATOR_CARRY_PK, simulator_bucket, get_carried_progress,
+    get_carried_progress_many,
 )
-from .logger import get_logger, log_with_data, create_error_log_entry
+from .cache import TTLCache, station_cache
+from .metrics import DbMetrics, db_metrics, instrument_client
+from .logger import get_logger, log_with_data, log_db_usage, create_error_log_entry
@@ -0,0 +1,77 @@
+"""In-process caches that survive warm Lambda invocations."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+STATION_CACHE_SIZE = int(os.environ.get("STATION_CACHE_SIZE", "1024"))
+STATION_CACHE_TTL_SECONDS = float(os.environ.get("STATION_CACHE_TTL_SECONDS", "30"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_size=1024, ttl_seconds=30.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, or load, cache and return it. None is not cached."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader(key)
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRatio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+# Station METADATA items by stationId, for the simulator's station loads. Port
+# items are not cached: their status changes with every session start and stop.
+# Nothing invalidates entries across processes, so decisions that must see the
+# latest status or tariff read the item directly.
+station_cache = TTLCache(STATION_CACHE_SIZE, STATION_CACHE_TTL_SECONDS)
@@ -1,8 +1,59 @@
 """DynamoDB helper utilities for Lambda functions."""
 
+import base64
+import json
 import os
+import queue
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from .metrics import instrument_client
+from .models import PORT_COUNTER_ATTRIBUTES
+
+# Resources and tables are created once per (region, endpoint) and reused for
+# the life of the process, so warm invocations keep their TCP/TLS connections.
+_registry_lock = threading.Lock()
+_resources = {}
+_clients = {}
+_tables = {}
+PARALLEL_SCAN_SEGMENTS = int(os.environ.get("DYNAMODB_SCAN_SEGMENTS", "8"))
+
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+BATCH_MAX_WORKERS = int(os.environ.get("DYNAMODB_BATCH_WORKERS", "8"))
+BATCH_MAX_ATTEMPTS = 6
+BATCH_BACKOFF_BASE_SECONDS = 0.05
+RETRYABLE_ERROR_CODES = (
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+)
+# Transactions are also worth retrying when cancelled by a conflicting write.
+TRANSACTION_RETRYABLE_ERROR_CODES = RETRYABLE_ERROR_CODES + (
+    "TransactionConflictException",
+    "TransactionCanceledException",
+)
+
+# The charging simulator keeps its per-station bookkeeping (cursor, carried
+# progress) in the Sessions table, grouped into fixed buckets of stations.
+SIMULATOR_BUCKETS = 32
+SIMULATOR_CARRY_PK = "SIMULATOR#CARRY"
+
+_registry_stats = {
+    "resourcesCreated": 0, "resourcesReused": 0, "clientsCreated": 0, "clientsReused": 0,
+    "tablesCreated": 0, "tablesReused": 0,
+}
 
 
 def _get_endpoint():
@@ -10,12 +61,63 @@ def _get_endpoint():
     return endpoint if endpoint else None
 
 
-def get_dynamodb_resource():
-    kwargs = {"region_name": os.environ.get("AWS_REGION_NAME", "us-east-1")}
-    endpoint = _get_endpoint()
-    if endpoint:
-        kwargs["endpoint_url"] = endpoint
-    return boto3.resource("dynamodb", **kwargs)
+def _get_client_config():
+    """botocore Config for the DynamoDB client, tunable through environment variables."""
+    return Config(
+        max_pool_connections=int(os.environ.get("DYNAMODB_MAX_POOL_CONNECTIONS", "50")),
+        tcp_keepalive=os.environ.get("DYNAMODB_TCP_KEEPALIVE", "true").lower() == "true",
+        connect_timeout=float(os.environ.get("DYNAMODB_CONNECT_TIMEOUT", "2")),
+        read_timeout=float(os.environ.get("DYNAMODB_READ_TIMEOUT", "5")),
+        retries={
+            "mode": os.environ.get("DYNAMODB_RETRY_MODE", "adaptive"),
+            "max_attempts": int(os.environ.get("DYNAMODB_MAX_ATTEMPTS", "5")),
+        },
+    )
+
+
+def get_dynamodb_resource(region_name=None, endpoint_url=None):
+    """Get the process-wide DynamoDB resource for a region and endpoint."""
+    region_name = region_name or os.environ.get("AWS_REGION_NAME", "us-east-1")
+    endpoint_url = endpoint_url or _get_endpoint()
+    key = (region_name, endpoint_url)
+    with _registry_lock:
+        resource = _resources.get(key)
+        if resource is not None:
+            _registry_stats["resourcesReused"] += 1
+            return resource
+
+        kwargs = {"region_name": region_name, "config": _get_client_config()}
+        if endpoint_url:
+            kwargs["endpoint_url"] = endpoint_url
+        resource = boto3.session.Session().resource("dynamodb", **kwargs)
+        instrument_client(resource.meta.client)
+        _resources[key] = resource
+        _registry_stats["resourcesCreated"] += 1
+        return resource
+
+
+def get_dynamodb_client(region_name=None, endpoint_url=None):
+    """
+    Get the process-wide low-level DynamoDB client for a region and endpoint,
+    for requests built as DynamoDB-JSON. Unlike the resource's meta.client it
+    applies no type transformation.
+    """
+    region_name = region_name or os.environ.get("AWS_REGION_NAME", "us-east-1")
+    endpoint_url = endpoint_url or _get_endpoint()
+    key = (region_name, endpoint_url)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _registry_stats["clientsReused"] += 1
+            return client
+
+        kwargs = {"region_name": region_name, "config": _get_client_config()}
+        if endpoint_url:
+            kwargs["endpoint_url"] = endpoint_url
+        client = instrument_client(boto3.session.Session().client("dynamodb", **kwargs))
+        _clients[key] = client
+        _registry_stats["clientsCreated"] += 1
+        return client
 
 
 def get_table(table_env_var):
@@ -24,7 +126,42 @@ def get_table(table_env_var):
     if not table_name:
         raise ValueError(f"Environment variable {table_env_var} not set")
     db = get_dynamodb_resource()
-    return db.Table(table_name)
+    key = (db.meta.client.meta.region_name, db.meta.client.meta.endpoint_url, table_name)
+    with _registry_lock:
+        table = _tables.get(key)
+        if table is not None:
+            _registry_stats["tablesReused"] += 1
+            return table
+        table = db.Table(table_name)
+        _tables[key] = table
+        _registry_stats["tablesCreated"] += 1
+        return table
+
+
+def get_pool_stats():
+    """
+    Registry and connection pool counters for this process. A connection
+    reuse ratio close to 1 means warm invocations are skipping TCP/TLS setup.
+    """
+    with _registry_lock:
+        stats = dict(_registry_stats)
+        clients = [resource.meta.client for resource in _resources.values()] + list(_clients.values())
+
+    opened = requests = 0
+    for client in clients:
+        try:
+            manager = client._endpoint.http_session._manager
+            for pool_key in list(manager.pools.keys()):
+                pool = manager.pools.get(pool_key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    requests += pool.num_requests
+        except AttributeError:
+            continue
+    stats["connectionsOpened"] = opened
+    stats["requests"] = requests
+    stats["connectionReuseRatio"] = round(1 - opened / requests, 4) if requests else None
+    return stats
 
 
 def get_stations_table():
@@ -49,12 +186,132 @@ def put_item(table, item):
     return item
 
 
+def batch_put_items(table, items):
+    """
+    Put items in chunks of 25, running the chunks concurrently.
+    Returns {"succeeded": [(PK, SK), ...], "failed": {(PK, SK): error}}.
+    """
+    requests = {_item_key(item): {"PutRequest": {"Item": item}} for item in items}
+    return _run_batches(table, list(requests.items()), BATCH_WRITE_SIZE, _batch_write)
+
+
+def batch_delete_items(table, keys):
+    """
+    Delete items by {"PK", "SK"} keys in chunks of 25, running the chunks concurrently.
+    Returns {"succeeded": [(PK, SK), ...], "failed": {(PK, SK): error}}.
+    """
+    requests = {
+        _item_key(key): {"DeleteRequest": {"Key": {"PK": key["PK"], "SK": key["SK"]}}}
+        for key in keys
+    }
+    return _run_batches(table, list(requests.items()), BATCH_WRITE_SIZE, _batch_write)
+
+
+def batch_get_items(table, keys, projection=None, consistent_read=False):
+    """
+    Get items by {"PK", "SK"} keys in chunks of 100, running the chunks concurrently.
+    Returns {"items": {(PK, SK): item}, "missing": [(PK, SK), ...], "failed": {(PK, SK): error}}.
+    """
+    spec = {"ConsistentRead": consistent_read}
+    _apply_projection(spec, projection, ("PK", "SK"))
+    requests = {_item_key(key): {"PK": key["PK"], "SK": key["SK"]} for key in keys}
+    results = _run_batches(table, list(requests.items()), BATCH_GET_SIZE, partial(_batch_get, spec=spec))
+    found = results.pop("items")
+    return {
+        "items": found,
+        "missing": [key for key in results.pop("succeeded") if key not in found],
+        "failed": results["failed"],
+    }
+
+
 def put_item_conditional(table, item, condition_expression):
     """Put an item with a condition (for optimistic locking)."""
     table.put_item(Item=item, ConditionExpression=condition_expression)
     return item
 
 
+def port_status_actions(table_name, station_id, port_id, from_status, to_status, now):
+    """
+    TransactWriteItems actions (plain values, for a resource's client) that
+    move a port from `from_status` to `to_status`, shift the station's port
+    counters to match and bump its version. The port update only applies
+    while the port is still in `from_status`, so a counter is never moved
+    twice for one change.
+    """
+    return [
+        {"Update": {
+            "TableName": table_name,
+            "Key": {"PK": f"STATION#{station_id}", "SK": f"PORT#{port_id}"},
+            "UpdateExpression": "SET #status = :to, updatedAt = :now",
+            "ConditionExpression": "#status = :from",
+            "ExpressionAttributeNames": {"#status": "status"},
+            "ExpressionAttributeValues": {":to": to_status, ":from": from_status, ":now": now},
+        }},
+        port_counter_action(table_name, station_id, {from_status: -1, to_status: 1}),
+    ]
+
+
+def port_counter_action(table_name, station_id, deltas):
+    """
+    TransactWriteItems action adding `deltas` ({port status: n}) to a station's
+    port counters and bumping its version (a station without one counts as
+    version 1, like Station.version).
+    """
+    names, values, parts = {}, {}, []
+    for n, (status, delta) in enumerate(sorted(deltas.items())):
+        if delta:
+            names[f"#c{n}"] = PORT_COUNTER_ATTRIBUTES[status]
+            values[f":d{n}"] = delta
+            parts.append(f"#c{n} :d{n}")
+    if not parts:
+        raise ValueError("Port counter update without any change")
+    names["#version"] = "version"
+    values[":one"] = 1
+    return {"Update": {
+        "TableName": table_name,
+        "Key": {"PK": f"STATION#{station_id}", "SK": "METADATA"},
+        "UpdateExpression": "ADD " + ", ".join(parts) + " SET #version = if_not_exists(#version, :one) + :one",
+        "ConditionExpression": "attribute_exists(PK)",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }}
+
+
+def simulator_bucket(station_id):
+    """Fixed bucket (crc32 of the station id) the simulator files a station's records under."""
+    return zlib.crc32(station_id.encode()) % SIMULATOR_BUCKETS
+
+
+def get_carried_progress(table, station_id, session_id):
+    """
+    Progress of an active session that the simulator computed but has not
+    written to the session yet: (entry, carry item) or None. The entry is
+    [chargePercent, energyConsumedKwh, totalCost, updatedAt of the session it
+    was computed from].
+    """
+    prefix = f"BUCKET#{simulator_bucket(station_id):02d}#"
+    for item in iter_query_pk(table, SIMULATOR_CARRY_PK, prefix):
+        entry = item["sessions"].get(session_id)
+        if entry is not None:
+            return entry, item
+    return None
+
+
+def get_carried_progress_many(table, sessions):
+    """
+    {sessionId: entry} of the carried-over progress (see get_carried_progress)
+    of `sessions`, reading each simulator bucket they fall in once.
+    """
+    wanted = {}
+    for session in sessions:
+        wanted.setdefault(simulator_bucket(session["stationId"]), set()).add(session["sessionId"])
+    progress = {}
+    for bucket, session_ids in wanted.items():
+        for item in iter_query_pk(table, SIMULATOR_CARRY_PK, f"BUCKET#{bucket:02d}#"):
+            progress.update((k, v) for k, v in item["sessions"].items() if k in session_ids)
+    return progress
+
+
 def get_item(table, pk, sk):
     """Get a single item by PK and SK."""
     response = table.get_item(Key={"PK": pk, "SK": sk})
@@ -63,31 +320,15 @@ def get_item(table, pk, sk):
 
 def query_pk(table, pk, sk_prefix=None):
     """Query all items with a given PK, optionally filtered by SK prefix."""
-    if sk_prefix:
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(pk) & Key("SK").begins_with(sk_prefix)
-        )
-    else:
-        response = table.query(KeyConditionExpression=Key("PK").eq(pk))
-    return response.get("Items", [])
+    return list(iter_query_pk(table, pk, sk_prefix))
 
 
 def query_gsi(table, index_name, pk_attr, pk_value, sk_attr=None, sk_value=None, limit=None, scan_forward=True):
     """Query a GSI with optional sort key and limit."""
-    key_condition = Key(pk_attr).eq(pk_value)
-    if sk_attr and sk_value:
-        key_condition = key_condition & Key(sk_attr).eq(sk_value)
-
-    kwargs = {
-        "IndexName": index_name,
-        "KeyConditionExpression": key_condition,
-        "ScanIndexForward": scan_forward,
-    }
-    if limit:
-        kwargs["Limit"] = limit
-
-    response = table.query(**kwargs)
-    return response.get("Items", [])
+    return list(iter_query_gsi(
+        table, index_name, pk_attr, pk_value, sk_attr, sk_value,
+        max_items=limit, scan_forward=scan_forward,
+    ))
 
 
 def update_item(table, pk, sk, update_expr, expr_attr_values, expr_attr_names=None, condition_expression=None):
@@ -113,10 +354,291 @@ def delete_item(table, pk, sk):
 
 def scan_table(table, filter_expression=None, limit=None):
     """Scan an entire table with optional filter."""
+    return list(iter_scan_table(table, filter_expression, max_items=limit))
+
+
+class ItemStream:
+    """
+    Lazily iterate the items of a query or scan, fetching the next page only
+    when the previous one is used up. `cursor` is an opaque token for the
+    position after the last item yielded (None once the results are
+    exhausted); pass it back as `cursor=` to resume from there. A cursor whose
+    key names differ from `key_names`, or whose values differ from `partition`
+    ({attribute: value} fixed by the query), raises ValueError.
+    """
+
+    def __init__(self, table, operation, kwargs, max_items=None, page_size=None,
+                 cursor=None, key_names=("PK", "SK"), partition=None):
+        self.table = table
+        self.operation = operation
+        self.kwargs = kwargs
+        self.max_items = max_items
+        self.page_size = page_size
+        self.key_names = key_names
+        self.pages = 0
+        self.items = 0
+        self._position = decode_cursor(cursor) if cursor else None
+        self._exhausted = False
+        if self._position is not None and (
+            set(self._position) != set(key_names)
+            or any(self._position.get(name) != value for name, value in (partition or {}).items())
+        ):
+            raise ValueError("Invalid cursor: it was issued for a different query")
+
+    def __iter__(self):
+        kwargs = dict(self.kwargs)
+        if self._position:
+            kwargs["ExclusiveStartKey"] = self._position
+        while not self._exhausted:
+            remaining = None if self.max_items is None else self.max_items - self.items
+            if remaining is not None and remaining <= 0:
+                return
+            limits = [n for n in (self.page_size, remaining) if n]
+            if limits:
+                kwargs["Limit"] = min(limits)
+            response = getattr(self.table, self.operation)(**kwargs)
+            self.pages += 1
+            last_key = response.get("LastEvaluatedKey")
+            if last_key:
+                self.key_names = tuple(last_key)
+            for item in response.get("Items", []):
+                self.items += 1
+                self._position = {name: item[name] for name in self.key_names if name in item}
+                yield item
+            if not last_key:
+                self._exhausted = True
+                self._position = None
+                return
+            self._position = last_key
+            kwargs["ExclusiveStartKey"] = last_key
+
+    @property
+    def cursor(self):
+        return encode_cursor(self._position) if self._position else None
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def encode_cursor(key):
+    """Encode a DynamoDB key as a URL-safe token."""
+    raw = json.dumps({k: _serializer.serialize(v) for k, v in key.items()}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor back into a DynamoDB key."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return {k: _deserializer.deserialize(v) for k, v in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _apply_projection(kwargs, projection, key_names):
+    """Add a ProjectionExpression for `projection`, always keeping the key attributes."""
+    if not projection:
+        return
+    names = list(dict.fromkeys([*projection, *key_names]))
+    placeholders = {f"#p{n}": name for n, name in enumerate(names)}
+    kwargs["ProjectionExpression"] = ", ".join(placeholders)
+    kwargs.setdefault("ExpressionAttributeNames", {}).update(placeholders)
+
+
+def iter_query_pk(table, pk, sk_prefix=None, max_items=None, projection=None, page_size=None, cursor=None):
+    """Stream all items with a given PK, optionally filtered by SK prefix."""
+    key_condition = Key("PK").eq(pk)
+    if sk_prefix:
+        key_condition = key_condition & Key("SK").begins_with(sk_prefix)
+    kwargs = {"KeyConditionExpression": key_condition}
+    _apply_projection(kwargs, projection, ("PK", "SK"))
+    return ItemStream(table, "query", kwargs, max_items, page_size, cursor, partition={"PK": pk})
+
+
+def iter_query_gsi(table, index_name, pk_attr, pk_value, sk_attr=None, sk_value=None, max_items=None,
+                   scan_forward=True, projection=None, page_size=None, cursor=None):
+    """Stream a GSI query with optional sort key."""
+    key_condition = Key(pk_attr).eq(pk_value)
+    if sk_attr and sk_value:
+        key_condition = key_condition & Key(sk_attr).eq(sk_value)
+    key_names = tuple(dict.fromkeys(n for n in ("PK", "SK", pk_attr, sk_attr) if n))
+
+    kwargs = {
+        "IndexName": index_name,
+        "KeyConditionExpression": key_condition,
+        "ScanIndexForward": scan_forward,
+    }
+    _apply_projection(kwargs, projection, key_names)
+    return ItemStream(table, "query", kwargs, max_items, page_size, cursor, key_names, {pk_attr: pk_value})
+
+
+def iter_scan_table(table, filter_expression=None, max_items=None, projection=None, page_size=None, cursor=None):
+    """Stream an entire table with optional filter."""
     kwargs = {}
     if filter_expression:
         kwargs["FilterExpression"] = filter_expression
-    if limit:
-        kwargs["Limit"] = limit
-    response = table.scan(**kwargs)
-    return response.get("Items", [])
+    _apply_projection(kwargs, projection, ("PK", "SK"))
+    return ItemStream(table, "scan", kwargs, max_items, page_size, cursor)
+
+
+def parallel_scan(table, total_segments=None, filter_expression=None, max_items=None,
+                  projection=None, page_size=None):
+    """
+    Scan `table` as `total_segments` parallel segments on a thread pool and
+    yield items as their pages arrive (in no particular order). At most two
+    pages per segment are buffered, and the workers stop as soon as
+    `max_items` items have been yielded or the generator is closed.
+    """
+    total_segments = total_segments or PARALLEL_SCAN_SEGMENTS
+    pages = queue.Queue(maxsize=2 * total_segments)
+    stop = threading.Event()
+
+    def scan_segment(segment):
+        try:
+            kwargs = {"Segment": segment, "TotalSegments": total_segments}
+            if filter_expression:
+                kwargs["FilterExpression"] = filter_expression
+            _apply_projection(kwargs, projection, ("PK", "SK"))
+            if page_size:
+                kwargs["Limit"] = page_size
+            while not stop.is_set():
+                response = table.meta.client.scan(TableName=table.name, **kwargs)
+                _put_unless_stopped(pages, stop, ("page", response.get("Items", [])))
+                if not response.get("LastEvaluatedKey"):
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except Exception as e:
+            _put_unless_stopped(pages, stop, ("error", e))
+        finally:
+            _put_unless_stopped(pages, stop, ("done", None))
+
+    pool = ThreadPoolExecutor(max_workers=total_segments)
+    try:
+        for segment in range(total_segments):
+            pool.submit(scan_segment, segment)
+        running = total_segments
+        yielded = 0
+        while running:
+            kind, payload = pages.get()
+            if kind == "done":
+                running -= 1
+            elif kind == "error":
+                raise payload
+            else:
+                for item in payload:
+                    yield item
+                    yielded += 1
+                    if max_items is not None and yielded >= max_items:
+                        return
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _put_unless_stopped(pages, stop, entry):
+    """Queue a result, giving up once the consumer has stopped reading."""
+    while not stop.is_set():
+        try:
+            pages.put(entry, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _item_key(item):
+    return item["PK"], item["SK"]
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def backoff(attempt):
+    """Sleep with full-jitter exponential backoff before retry number `attempt`."""
+    time.sleep(random.uniform(0, BATCH_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _run_batches(table, requests, size, send):
+    """Split (key, request) pairs into chunks, send them on a thread pool and merge the results."""
+    results = {"succeeded": [], "failed": {}, "items": {}}
+    chunks = chunked(requests, size)
+    if not chunks:
+        return results
+    with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(chunks))) as pool:
+        futures = [(pool.submit(send, table, chunk), chunk) for chunk in chunks]
+        for future, chunk in futures:
+            try:
+                succeeded, failed, items = future.result()
+            except Exception as e:
+                succeeded, failed, items = [], {key: str(e) for key, _ in chunk}, {}
+            results["succeeded"].extend(succeeded)
+            results["failed"].update(failed)
+            results["items"].update(items)
+    return results
+
+
+def _batch_write(table, chunk):
+    """BatchWriteItem one chunk, retrying UnprocessedItems and throttling with backoff."""
+    pending = chunk
+    succeeded = []
+    error = None
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        if attempt:
+            backoff(attempt)
+        try:
+            resp = table.meta.client.batch_write_item(
+                RequestItems={table.name: [request for _, request in pending]}
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in RETRYABLE_ERROR_CODES:
+                return succeeded, {key: str(e) for key, _ in pending}, {}
+            error = str(e)
+            continue
+
+        unprocessed = {
+            _item_key(request.get("PutRequest", {}).get("Item") or request["DeleteRequest"]["Key"])
+            for request in resp.get("UnprocessedItems", {}).get(table.name, [])
+        }
+        succeeded.extend(key for key, _ in pending if key not in unprocessed)
+        pending = [(key, request) for key, request in pending if key in unprocessed]
+        if not pending:
+            break
+        error = f"Unprocessed after {attempt + 1} attempts"
+
+    return succeeded, {key: error for key, _ in pending}, {}
+
+
+def _batch_get(table, chunk, spec):
+    """BatchGetItem one chunk, retrying UnprocessedKeys and throttling with backoff."""
+    pending = chunk
+    succeeded = []
+    items = {}
+    error = None
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        if attempt:
+            backoff(attempt)
+        try:
+            resp = table.meta.client.batch_get_item(
+                RequestItems={table.name: {**spec, "Keys": [key for _, key in pending]}}
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in RETRYABLE_ERROR_CODES:
+                return succeeded, {key: str(e) for key, _ in pending}, items
+            error = str(e)
+            continue
+
+        for item in resp.get("Responses", {}).get(table.name, []):
+            items[_item_key(item)] = item
+        unprocessed = {
+            _item_key(key)
+            for key in resp.get("UnprocessedKeys", {}).get(table.name, {}).get("Keys", [])
+        }
+        succeeded.extend(key for key, _ in pending if key not in unprocessed)
+        pending = [(key, request) for key, request in pending if key in unprocessed]
+        if not pending:
+            break
+        error = f"Unprocessed after {attempt + 1} attempts"
+
+    return succeeded, {key: error for key, _ in pending}, items
@@ -0,0 +1,104 @@
+"""Geohash encoding and cell coverage for nearby-station search."""
+
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+
+# geoCell, the GSI partition key, is the geohash prefix of this length
+# (about 39 x 19.5 km); the full geohash is the sort key, so finer cells are
+# a begins_with on the same partition.
+GEO_PARTITION_PRECISION = 4
+GEOHASH_PRECISION = 9
+MAX_QUERY_PRECISION = 7
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geo_attributes(latitude, longitude):
+    """Index attributes for a station at the given coordinates."""
+    geohash = encode(float(latitude), float(longitude))
+    return {"geohash": geohash, "geoCell": geohash[:GEO_PARTITION_PRECISION]}
+
+
+def cell_size_degrees(precision):
+    """(height, width) of a geohash cell in degrees."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lon_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=9):
+    """
+    Geohash prefixes that together cover the circle, at the finest precision
+    (at most MAX_QUERY_PRECISION, at least GEO_PARTITION_PRECISION) needing no
+    more than max_cells of them. Coarser than that, the partition precision
+    is used regardless of the count.
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lon_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    west, east = longitude - lon_delta, longitude + lon_delta
+
+    for precision in range(MAX_QUERY_PRECISION, GEO_PARTITION_PRECISION, -1):
+        height, width = cell_size_degrees(precision)
+        # Skip enumerating precisions whose cell count is clearly too high.
+        if (math.ceil((north - south) / height) + 1) * (math.ceil((east - west) / width) + 1) > 4 * max_cells:
+            continue
+        cells = _cells_in_box(south, north, west, east, precision)
+        if len(cells) <= max_cells:
+            return cells
+    return _cells_in_box(south, north, west, east, GEO_PARTITION_PRECISION)
+
+
+def _cells_in_box(south, north, west, east, precision):
+    height, width = cell_size_degrees(precision)
+    cells = set()
+    lat = south
+    while True:
+        lon = west
+        while True:
+            cells.add(encode(min(lat, 90.0), _wrap_longitude(lon), precision))
+            if lon >= east:
+                break
+            lon = min(lon + width, east)
+        if lat >= north:
+            break
+        lat = min(lat + height, north)
+    return sorted(cells)
+
+
+def _wrap_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -1,5 +1,6 @@
 """Structured JSON logging for Lambda functions with CloudWatch integration."""
 
+import functools
 import json
 import logging
 import os
@@ -59,6 +60,37 @@ def log_with_data(logger, level, message, **kwargs):
     logger.handle(record)
 
 
+def log_db_usage(service_name):
+    """
+    Decorator for a lambda_handler: starts a fresh DynamoDB metrics window for
+    each invocation and logs its summary, with the process's connection pool
+    counters, when the handler returns or raises.
+    """
+    from .db import get_pool_stats
+    from .metrics import DB_METRICS_ENABLED, db_metrics
+    logger = get_logger(service_name)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            db_metrics.reset()
+            try:
+                return handler(event, context)
+            finally:
+                if DB_METRICS_ENABLED:
+                    summary = db_metrics.summary()
+                    if summary["operations"]:
+                        log_with_data(
+                            logger, "info", "DynamoDB usage",
+                            action=event.get("action") if isinstance(event, dict) else None,
+                            requestId=getattr(context, "aws_request_id", None),
+                            pool=get_pool_stats(),
+                            **summary,
+                        )
+        return wrapper
+    return decorator
+
+
 def create_error_log_entry(service, level, message, details=None):
     """Create an error log dict ready for DynamoDB insertion."""
     from .models import ErrorLog
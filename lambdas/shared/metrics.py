@@ -0,0 +1,272 @@
+"""
+Per-invocation DynamoDB usage metrics: latency histograms, consumed capacity
+and item counts per table, index and operation.
+
+Collection hooks into the botocore event system of a client, so every call
+made through it is counted, whether it goes through the shared helpers or a
+handler's own table.* call. Each call requests ReturnConsumedCapacity=INDEXES.
+"""
+
+import os
+import threading
+import time
+
+DB_METRICS_ENABLED = os.environ.get("DB_METRICS_ENABLED", "true").lower() == "true"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+READ_OPERATIONS = {"GetItem", "Query", "Scan", "BatchGetItem", "TransactGetItems", "ExecuteStatement"}
+WRITE_OPERATIONS = {
+    "PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem", "TransactWriteItems", "ExecuteTransaction",
+}
+CAPACITY_OPERATIONS = READ_OPERATIONS | WRITE_OPERATIONS
+
+_CONTEXT_KEY = "dbMetrics"
+
+
+class DbMetrics:
+    """Thread-safe accumulator for DynamoDB calls made during one invocation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._started = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+            self._started = time.monotonic()
+
+    def record(self, table, index, operation, latency_ms, items=0, read_units=0.0, write_units=0.0,
+               index_units=None, error=None):
+        """Add one call. latency_ms=None adds capacity and items without counting a call."""
+        key = (table, index or "", operation)
+        with self._lock:
+            entry = self._operations.get(key)
+            if entry is None:
+                entry = self._operations[key] = {
+                    "calls": 0, "errors": 0, "items": 0, "readUnits": 0.0, "writeUnits": 0.0,
+                    "latencyMs": {"total": 0.0, "max": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)},
+                    "indexUnits": {}, "errorCodes": {},
+                }
+            entry["items"] += items
+            entry["readUnits"] += read_units
+            entry["writeUnits"] += write_units
+            if latency_ms is not None:
+                entry["calls"] += 1
+                latency = entry["latencyMs"]
+                latency["total"] += latency_ms
+                latency["max"] = max(latency["max"], latency_ms)
+                latency["histogram"][_bucket(latency_ms)] += 1
+            for name, units in (index_units or {}).items():
+                entry["indexUnits"][name] = entry["indexUnits"].get(name, 0.0) + units
+            if error:
+                entry["errors"] += 1
+                entry["errorCodes"][error] = entry["errorCodes"].get(error, 0) + 1
+
+    def summary(self):
+        """Operations sorted by consumed capacity, plus invocation totals."""
+        with self._lock:
+            operations = [(key, _copy_entry(entry)) for key, entry in self._operations.items()]
+            elapsed_ms = (time.monotonic() - self._started) * 1000
+
+        rows = []
+        totals = {"calls": 0, "errors": 0, "items": 0, "readUnits": 0.0, "writeUnits": 0.0, "dbTimeMs": 0.0}
+        for (table, index, operation), entry in operations:
+            latency = entry.pop("latencyMs")
+            row = {"table": table, "index": index or None, "operation": operation, **entry}
+            row["readUnits"] = round(row["readUnits"], 2)
+            row["writeUnits"] = round(row["writeUnits"], 2)
+            row["indexUnits"] = {k: round(v, 2) for k, v in row["indexUnits"].items()}
+            row["latencyMs"] = {
+                "avg": round(latency["total"] / entry["calls"], 2) if entry["calls"] else None,
+                "max": round(latency["max"], 2),
+                "p50": _percentile(latency["histogram"], entry["calls"], 0.50),
+                "p95": _percentile(latency["histogram"], entry["calls"], 0.95),
+                "histogram": _histogram_labels(latency["histogram"]),
+            }
+            if not row["indexUnits"]:
+                del row["indexUnits"]
+            if not row["errorCodes"]:
+                del row["errorCodes"]
+            rows.append(row)
+            for field in ("calls", "errors", "items", "readUnits", "writeUnits"):
+                totals[field] += entry[field]
+            totals["dbTimeMs"] += latency["total"]
+
+        rows.sort(key=lambda r: (r["readUnits"] + r["writeUnits"], r["calls"]), reverse=True)
+        totals = {k: round(v, 2) if isinstance(v, float) else v for k, v in totals.items()}
+        totals["elapsedMs"] = round(elapsed_ms, 2)
+        return {"totals": totals, "operations": rows}
+
+
+db_metrics = DbMetrics()
+
+
+def instrument_client(client, metrics=None):
+    """
+    Register the metrics hooks on a low-level DynamoDB client (for a resource,
+    pass resource.meta.client). Safe to call more than once per client.
+    """
+    if not DB_METRICS_ENABLED or getattr(client.meta, "_db_metrics_instrumented", False):
+        return client
+    metrics = metrics or db_metrics
+    events = client.meta.events
+    events.register("before-parameter-build.dynamodb.*", _before_call)
+    events.register("after-call.dynamodb.*", lambda **kwargs: _after_call(metrics, **kwargs))
+    events.register("after-call-error.dynamodb.*", lambda **kwargs: _after_error(metrics, **kwargs))
+    client.meta._db_metrics_instrumented = True
+    return client
+
+
+def _before_call(params, model, context, **kwargs):
+    operation = model.name
+    if operation in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "INDEXES")
+    context[_CONTEXT_KEY] = {
+        "start": time.perf_counter(),
+        "operation": operation,
+        "tables": _request_tables(operation, params),
+        "index": params.get("IndexName"),
+        "requested": _requested_items(operation, params),
+    }
+
+
+def _after_call(metrics, parsed, model, context, http_response=None, **kwargs):
+    call = context.pop(_CONTEXT_KEY, None)
+    if call is None:
+        return
+    latency_ms = (time.perf_counter() - call["start"]) * 1000
+    operation = model.name
+    error = None
+    if http_response is not None and http_response.status_code >= 300:
+        error = parsed.get("Error", {}).get("Code")
+
+    capacity = _capacity_by_table(operation, parsed.get("ConsumedCapacity"))
+    items = {} if error else _items_by_table(operation, parsed, call)
+    tables = call["tables"] or sorted(capacity) or ["?"]
+    # A call spanning several tables (batch, transaction) is counted once, on
+    # its first table; capacity and items are split across all of them.
+    for position, table in enumerate(tables):
+        read_units, write_units, index_units = capacity.get(table, (0.0, 0.0, None))
+        metrics.record(
+            table, call["index"], operation, latency_ms if position == 0 else None,
+            items=items.get(table, 0), read_units=read_units, write_units=write_units,
+            index_units=index_units, error=error,
+        )
+
+
+def _after_error(metrics, exception, context, **kwargs):
+    call = context.pop(_CONTEXT_KEY, None)
+    if call is None:
+        return
+    latency_ms = (time.perf_counter() - call["start"]) * 1000
+    table = (call["tables"] or ["?"])[0]
+    metrics.record(table, call["index"], call["operation"], latency_ms, error=type(exception).__name__)
+
+
+def _request_tables(operation, params):
+    if "TableName" in params:
+        return [params["TableName"]]
+    if operation in ("BatchGetItem", "BatchWriteItem"):
+        return sorted(params.get("RequestItems", {}))
+    if operation in ("TransactWriteItems", "TransactGetItems"):
+        tables = set()
+        for item in params.get("TransactItems", []):
+            for request in item.values():
+                tables.add(request.get("TableName"))
+        return sorted(t for t in tables if t)
+    return []
+
+
+def _requested_items(operation, params):
+    """Per-table item counts known from the request (writes and transactions)."""
+    if operation == "BatchWriteItem":
+        return {table: len(requests) for table, requests in params.get("RequestItems", {}).items()}
+    if operation in ("TransactWriteItems", "TransactGetItems"):
+        counts = {}
+        for item in params.get("TransactItems", []):
+            for request in item.values():
+                table = request.get("TableName")
+                counts[table] = counts.get(table, 0) + 1
+        return counts
+    return {}
+
+
+def _items_by_table(operation, parsed, call):
+    table = call["tables"][0] if call["tables"] else None
+    if operation in ("Query", "Scan"):
+        return {table: parsed.get("Count", 0)}
+    if operation == "GetItem":
+        return {table: 1 if parsed.get("Item") else 0}
+    if operation in ("PutItem", "UpdateItem", "DeleteItem"):
+        return {table: 1}
+    if operation == "BatchGetItem":
+        return {t: len(items) for t, items in parsed.get("Responses", {}).items()}
+    if operation == "BatchWriteItem":
+        unprocessed = parsed.get("UnprocessedItems", {})
+        return {t: n - len(unprocessed.get(t, [])) for t, n in call["requested"].items()}
+    if operation in ("TransactWriteItems", "TransactGetItems"):
+        return dict(call["requested"])
+    if operation == "ExecuteStatement":
+        return {table: len(parsed.get("Items", []))}
+    return {}
+
+
+def _capacity_by_table(operation, consumed):
+    """{table: (readUnits, writeUnits, {index: units})} from a ConsumedCapacity response."""
+    if not consumed:
+        return {}
+    entries = consumed if isinstance(consumed, list) else [consumed]
+    result = {}
+    for entry in entries:
+        read_units, write_units = _split_units(operation, entry)
+        index_units = {}
+        for group in ("GlobalSecondaryIndexes", "LocalSecondaryIndexes"):
+            for name, units in (entry.get(group) or {}).items():
+                index_units[name] = float(units.get("CapacityUnits", 0))
+        previous = result.get(entry.get("TableName"))
+        if previous:
+            read_units += previous[0]
+            write_units += previous[1]
+            for name, units in (previous[2] or {}).items():
+                index_units[name] = index_units.get(name, 0.0) + units
+        result[entry.get("TableName")] = (read_units, write_units, index_units or None)
+    return result
+
+
+def _split_units(operation, entry):
+    if "ReadCapacityUnits" in entry or "WriteCapacityUnits" in entry:
+        return float(entry.get("ReadCapacityUnits", 0)), float(entry.get("WriteCapacityUnits", 0))
+    units = float(entry.get("CapacityUnits", 0))
+    return (0.0, units) if operation in WRITE_OPERATIONS else (units, 0.0)
+
+
+def _bucket(latency_ms):
+    for position, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return position
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _percentile(histogram, count, quantile):
+    """Upper bound of the histogram bucket holding the quantile, or None past the last bound."""
+    target = quantile * count
+    seen = 0
+    for position, hits in enumerate(histogram):
+        seen += hits
+        if seen >= target and hits:
+            return LATENCY_BUCKETS_MS[position] if position < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+def _histogram_labels(histogram):
+    labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+    return {label: hits for label, hits in zip(labels, histogram) if hits}
+
+
+def _copy_entry(entry):
+    copy = dict(entry)
+    copy["latencyMs"] = dict(entry["latencyMs"], histogram=list(entry["latencyMs"]["histogram"]))
+    copy["indexUnits"] = dict(entry["indexUnits"])
+    copy["errorCodes"] = dict(entry["errorCodes"])
+    return copy
@@ -7,6 +7,8 @@ from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
 from typing import Optional
 
+from .geo import geo_attributes
+
 
 class StationStatus(str, Enum):
     NEW = "NEW"
@@ -64,6 +66,14 @@ PORT_TRANSITIONS = {
     PortStatus.ERROR: [PortStatus.FREE],
 }
 
+# Station METADATA attributes counting the station's ports in each status.
+PORT_COUNTER_ATTRIBUTES = {
+    PortStatus.FREE.value: "freePorts",
+    PortStatus.RESERVED.value: "reservedPorts",
+    PortStatus.CHARGING.value: "chargingPorts",
+    PortStatus.ERROR.value: "errorPorts",
+}
+
 SESSION_TRANSITIONS = {
     SessionStatus.STARTED: [SessionStatus.IN_PROGRESS, SessionStatus.FAILED],
     SessionStatus.IN_PROGRESS: [
@@ -84,6 +94,13 @@ ERROR_LOG_TRANSITIONS = {
 }
 
 
+def initial_port_counters(total_ports):
+    """Port counters for a new station, whose ports all start FREE."""
+    counters = {attribute: 0 for attribute in PORT_COUNTER_ATTRIBUTES.values()}
+    counters[PORT_COUNTER_ATTRIBUTES[PortStatus.FREE.value]] = total_ports
+    return counters
+
+
 def validate_transition(current_status, new_status, transitions_map):
     """Validate that a state transition is allowed. Returns True if valid."""
     allowed = transitions_map.get(current_status, [])
@@ -114,6 +131,7 @@ class Station:
     power_kw: float
     tariff_per_kwh: float
     status: str = StationStatus.NEW.value
+    version: int = 1
     created_at: str = field(default_factory=_now_iso)
     updated_at: str = field(default_factory=_now_iso)
 
@@ -121,6 +139,9 @@ class Station:
         return {
             "PK": f"STATION#{self.station_id}",
             "SK": "METADATA",
+            "entityType": "STATION",
+            **geo_attributes(self.latitude, self.longitude),
+            **initial_port_counters(self.total_ports),
             "stationId": self.station_id,
             "name": self.name,
             "address": self.address,
@@ -130,6 +151,7 @@ class Station:
             "powerKw": self.power_kw,
             "tariffPerKwh": self.tariff_per_kwh,
             "status": self.status,
+            "version": self.version,
             "createdAt": self.created_at,
             "updatedAt": self.updated_at,
         }
@@ -146,6 +168,7 @@ class Station:
             power_kw=float(item["powerKw"]),
             tariff_per_kwh=float(item["tariffPerKwh"]),
             status=item["status"],
+            version=int(item.get("version", 1)),
             created_at=item.get("createdAt", ""),
             updated_at=item.get("updatedAt", ""),
         )
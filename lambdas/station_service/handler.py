@@ -4,18 +4,46 @@ Station Service Lambda — invoked by the backend for station CRUD operations.
 
 import os
 import json
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from decimal import Decimal
+from functools import partial
 
-import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+
+from shared.cache import TTLCache
+from shared.db import (
+    ItemStream, batch_delete_items, batch_put_items, encode_cursor, get_dynamodb_resource, iter_query_gsi,
+    iter_query_pk,
+)
+from shared.geo import GEO_PARTITION_PRECISION, covering_cells, distance_km, geo_attributes
+from shared.models import PORT_COUNTER_ATTRIBUTES, initial_port_counters
+from shared.logger import log_db_usage
 
 STATIONS_TABLE = os.environ.get("STATIONS_TABLE", "Stations")
 REGION = os.environ.get("AWS_REGION_NAME", "us-east-1")
-
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
+LIST_PAGE_SIZE = int(os.environ.get("STATION_LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = 200
+NEARBY_DEFAULT_RADIUS_KM = 5.0
+NEARBY_MAX_RADIUS_KM = 50.0
+NEARBY_DEFAULT_LIMIT = 10
+NEARBY_MAX_LIMIT = 50
+NEARBY_MAX_WORKERS = 8
+STATION_VERSION_TTL_SECONDS = float(os.environ.get("STATION_VERSION_TTL_SECONDS", "1"))
+STATION_DETAIL_CACHE_SIZE = int(os.environ.get("STATION_DETAIL_CACHE_SIZE", "256"))
+# TransactWriteItems accepts at most 100 actions: the metadata item plus 99 ports.
+TRANSACT_MAX_ITEMS = 100
+
+dynamodb = get_dynamodb_resource(REGION)
 stations_table = dynamodb.Table(STATIONS_TABLE)
+# Reused across warm invocations for the per-cell geo queries.
+query_pool = ThreadPoolExecutor(max_workers=NEARBY_MAX_WORKERS)
+# stationId -> last seen version, trusted for a short TTL; and the station
+# detail per (stationId, version), which cannot go stale.
+version_cache = TTLCache(STATION_DETAIL_CACHE_SIZE * 4, STATION_VERSION_TTL_SECONDS)
+detail_cache = TTLCache(STATION_DETAIL_CACHE_SIZE, 3600)
 
 STATION_TRANSITIONS = {
     "NEW": ["ACTIVE"],
@@ -25,12 +53,14 @@ STATION_TRANSITIONS = {
 }
 
 
+@log_db_usage("station_service")
 def lambda_handler(event, context):
     """Route requests based on the 'action' field."""
     action = event.get("action")
     handlers = {
         "list": handle_list,
         "get": handle_get,
+        "nearby": handle_nearby,
         "create": handle_create,
         "update_status": handle_update_status,
         "update_tariff": handle_update_tariff,
@@ -48,30 +78,130 @@ def lambda_handler(event, context):
 
 
 def handle_list(event):
-    resp = stations_table.scan(
-        FilterExpression="SK = :sk",
-        ExpressionAttributeValues={":sk": "METADATA"},
-    )
-    stations = [_format_station(item) for item in resp.get("Items", [])]
-    return _response(200, {"stations": stations})
+    """
+    One page of stations ordered by stationId. Reads only METADATA items:
+    the sparse entityType-index, or status-index when filtering by status.
+    """
+    status = event.get("status")
+    try:
+        limit = int(event["limit"]) if event.get("limit") not in (None, "") else LIST_PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = None
+    if limit is None or not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+        return _response(400, {"error": f"limit must be an integer between 1 and {LIST_MAX_PAGE_SIZE}"})
+    # status-index also holds port items, keyed by port statuses.
+    if status and status not in STATION_TRANSITIONS:
+        return _response(400, {"error": f"status must be one of {', '.join(STATION_TRANSITIONS)}"})
+
+    if status:
+        index, key_attr, key_value = "status-index", "status", status
+    else:
+        index, key_attr, key_value = "entityType-index", "entityType", "STATION"
+    # One item past the page tells whether another page follows, so the last
+    # page comes back with a null nextCursor.
+    try:
+        stream = iter_query_gsi(
+            stations_table, index, key_attr, key_value, sk_attr="stationId",
+            max_items=limit + 1, page_size=limit + 1, cursor=event.get("cursor"),
+        )
+        items = list(stream)
+    except ValueError as e:
+        return _response(400, {"error": str(e)})
+    next_cursor = None
+    if len(items) > limit:
+        last = items[limit - 1]
+        next_cursor = encode_cursor({name: last[name] for name in stream.key_names})
+    stations = [_format_station(item) for item in items[:limit]]
+    return _response(200, {"stations": stations, "nextCursor": next_cursor})
 
 
 def handle_get(event):
+    """
+    Station detail with its ports. Any metadata or port change bumps the
+    station's version: a caller sending the version it already has as
+    `ifVersion` gets a 304 without the detail, and unchanged detail is served
+    from memory.
+    """
     station_id = event.get("stationId")
-    resp = stations_table.query(
-        KeyConditionExpression=Key("PK").eq(f"STATION#{station_id}")
-    )
-    items = resp.get("Items", [])
-    if not items:
+    if_version = event.get("ifVersion")
+    try:
+        if_version = int(if_version) if if_version is not None else None
+    except (TypeError, ValueError):
+        return _response(400, {"error": "ifVersion must be an integer"})
+
+    version = version_cache.get(station_id)
+    if version is None and if_version is not None:
+        version = _read_version(station_id)
+        if version is None:
+            return _response(404, {"error": f"Station {station_id} not found"})
+        version_cache.put(station_id, version)
+    if version is not None:
+        if version == if_version:
+            return _response(304, {"stationId": station_id, "version": version, "notModified": True})
+        station = detail_cache.get((station_id, version))
+        if station is not None:
+            return _response(200, {"station": station})
+
+    station = _read_station_detail(station_id)
+    if station is None:
         return _response(404, {"error": f"Station {station_id} not found"})
-
-    metadata = next((i for i in items if i["SK"] == "METADATA"), None)
-    ports = [_format_port(i) for i in items if i["SK"].startswith("PORT#")]
-    station = _format_station(metadata)
-    station["ports"] = ports
+    version_cache.put(station_id, station["version"])
+    detail_cache.put((station_id, station["version"]), station)
     return _response(200, {"station": station})
 
 
+def handle_nearby(event):
+    """
+    The `limit` nearest stations within `radiusKm` of a point, closest first.
+    Candidates come from the geo-index cells covering the circle, queried in
+    parallel; `status` and `minFreePorts` narrow the result.
+    """
+    try:
+        latitude = float(event["latitude"])
+        longitude = float(event["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return _response(400, {"error": "latitude and longitude are required and must be numbers"})
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return _response(400, {"error": "latitude/longitude out of range"})
+    # An explicit radiusKm of 0 is rejected rather than replaced by the default.
+    radius_km = event.get("radiusKm")
+    try:
+        radius_km = float(radius_km) if radius_km not in (None, "") else NEARBY_DEFAULT_RADIUS_KM
+    except (TypeError, ValueError):
+        radius_km = None
+    if radius_km is None or not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return _response(400, {"error": f"radiusKm must be a number in (0, {NEARBY_MAX_RADIUS_KM:g}]"})
+    try:
+        limit = int(event["limit"]) if event.get("limit") not in (None, "") else NEARBY_DEFAULT_LIMIT
+    except (TypeError, ValueError):
+        limit = None
+    if limit is None or not 1 <= limit <= NEARBY_MAX_LIMIT:
+        return _response(400, {"error": f"limit must be an integer between 1 and {NEARBY_MAX_LIMIT}"})
+    min_free_ports = event.get("minFreePorts")
+    if min_free_ports in (None, ""):
+        min_free_ports = 0
+    elif isinstance(min_free_ports, str) and min_free_ports.isdigit():
+        min_free_ports = int(min_free_ports)
+    elif isinstance(min_free_ports, bool) or not isinstance(min_free_ports, int) or min_free_ports < 0:
+        return _response(400, {"error": "minFreePorts must be an integer >= 0"})
+
+    cells = covering_cells(latitude, longitude, radius_km)
+    candidates = []
+    for items in query_pool.map(partial(_query_geo_cell, status=event.get("status")), cells):
+        for item in items:
+            distance = distance_km(latitude, longitude, float(item["latitude"]), float(item["longitude"]))
+            if distance <= radius_km and int(item.get("freePorts", 0)) >= min_free_ports:
+                candidates.append((distance, item))
+    candidates.sort(key=lambda c: (c[0], c[1]["stationId"]))
+
+    stations = []
+    for distance, item in candidates[:limit]:
+        station = _format_station(item)
+        station["distanceKm"] = round(distance, 3)
+        stations.append(station)
+    return _response(200, {"stations": stations})
+
+
 def handle_create(event):
     data = event.get("data", {})
     station_id = f"station-{uuid.uuid4().hex[:8]}"
@@ -80,6 +210,7 @@ def handle_create(event):
     station_item = {
         "PK": f"STATION#{station_id}",
         "SK": "METADATA",
+        "entityType": "STATION",
         "stationId": station_id,
         "name": data["name"],
         "address": data["address"],
@@ -91,12 +222,15 @@ def handle_create(event):
         "status": "NEW",
         "createdAt": now,
         "updatedAt": now,
+        **geo_attributes(data["latitude"], data["longitude"]),
+        **initial_port_counters(data["totalPorts"]),
+        "version": 1,
     }
-    stations_table.put_item(Item=station_item)
 
+    ports = []
     for i in range(1, data["totalPorts"] + 1):
         port_id = f"port-{station_id}-{str(i).zfill(3)}"
-        stations_table.put_item(Item={
+        ports.append({
             "PK": f"STATION#{station_id}",
             "SK": f"PORT#{port_id}",
             "portId": port_id,
@@ -106,7 +240,62 @@ def handle_create(event):
             "updatedAt": now,
         })
 
-    return _response(201, {"station": _format_station(station_item)})
+    started = time.perf_counter()
+    if len(ports) + 1 <= TRANSACT_MAX_ITEMS:
+        _create_transactional(station_item, ports)
+        write_mode = "transaction"
+    else:
+        _create_batched(station_item, ports)
+        write_mode = "batch"
+    write_latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    return _response(201, {
+        "station": _format_station(station_item),
+        "writeMode": write_mode,
+        "writeLatencyMs": write_latency_ms,
+    })
+
+
+def _create_transactional(station_item, ports):
+    """Write the metadata item and all ports atomically in one transaction."""
+    stations_table.meta.client.transact_write_items(TransactItems=[
+        {"Put": {
+            "TableName": stations_table.name,
+            "Item": station_item,
+            "ConditionExpression": "attribute_not_exists(PK)",
+        }},
+        *({"Put": {"TableName": stations_table.name, "Item": port}} for port in ports),
+    ])
+
+
+def _create_batched(station_item, ports):
+    """
+    Write the ports in parallel batches, then the metadata item, so a station
+    only becomes visible once all of its ports exist. Ports that still fail
+    after the batch retries get one more pass; if any remain, or the metadata
+    write fails, the ports already written are deleted again.
+    """
+    written = batch_put_items(stations_table, ports)
+    succeeded, failed = written["succeeded"], written["failed"]
+    if failed:
+        retry = batch_put_items(stations_table, [p for p in ports if (p["PK"], p["SK"]) in failed])
+        succeeded, failed = succeeded + retry["succeeded"], retry["failed"]
+    if failed:
+        _rollback_ports(succeeded)
+        raise RuntimeError(
+            f"Failed to create {len(failed)} ports for {station_item['stationId']}; creation rolled back"
+        )
+    try:
+        stations_table.put_item(Item=station_item, ConditionExpression="attribute_not_exists(PK)")
+    except Exception:
+        _rollback_ports(succeeded)
+        raise
+
+
+def _rollback_ports(keys):
+    deleted = batch_delete_items(stations_table, [{"PK": pk, "SK": sk} for pk, sk in keys])
+    if deleted["failed"]:
+        print(f"Rollback left {len(deleted['failed'])} orphaned ports: {sorted(deleted['failed'])}")
 
 
 def handle_update_status(event):
@@ -127,17 +316,19 @@ def handle_update_status(event):
             "error": f"Cannot transition from {current} to {new_status}. Allowed: {allowed}"
         })
 
-    stations_table.update_item(
+    resp = stations_table.update_item(
         Key={"PK": f"STATION#{station_id}", "SK": "METADATA"},
-        UpdateExpression="SET #status = :status, updatedAt = :now",
+        UpdateExpression="SET #status = :status, updatedAt = :now, version = if_not_exists(version, :one) + :one",
         ExpressionAttributeNames={"#status": "status"},
         ExpressionAttributeValues={
             ":status": new_status,
             ":now": datetime.now(timezone.utc).isoformat(),
+            ":one": 1,
         },
+        ReturnValues="ALL_NEW",
     )
-    item["status"] = new_status
-    return _response(200, {"station": _format_station(item)})
+    _invalidate(station_id)
+    return _response(200, {"station": _format_station(resp["Attributes"])})
 
 
 def handle_update_tariff(event):
@@ -146,15 +337,61 @@ def handle_update_tariff(event):
 
     stations_table.update_item(
         Key={"PK": f"STATION#{station_id}", "SK": "METADATA"},
-        UpdateExpression="SET tariffPerKwh = :tariff, updatedAt = :now",
+        UpdateExpression=(
+            "SET tariffPerKwh = :tariff, updatedAt = :now, version = if_not_exists(version, :one) + :one"
+        ),
         ExpressionAttributeValues={
             ":tariff": Decimal(str(tariff)),
             ":now": datetime.now(timezone.utc).isoformat(),
+            ":one": 1,
         },
     )
+    _invalidate(station_id)
     return _response(200, {"message": "Tariff updated"})
 
 
+def _read_version(station_id):
+    """Current version of a station (1 if it predates versioning), or None if it does not exist."""
+    item = stations_table.get_item(
+        Key={"PK": f"STATION#{station_id}", "SK": "METADATA"},
+        ProjectionExpression="PK, #version",
+        ExpressionAttributeNames={"#version": "version"},
+    ).get("Item")
+    return int(item.get("version", 1)) if item else None
+
+
+def _read_station_detail(station_id):
+    """Metadata and ports of a station in one query over its partition."""
+    items = list(iter_query_pk(stations_table, f"STATION#{station_id}"))
+    metadata = next((item for item in items if item["SK"] == "METADATA"), None)
+    if metadata is None:
+        return None
+    ports = [_format_port(item) for item in items if item["SK"].startswith("PORT#")]
+    station = _format_station(metadata)
+    station["ports"] = ports
+    # The counters and the port list come from the same read but not from one
+    # snapshot; recounting keeps them consistent with each other.
+    for status, attribute in PORT_COUNTER_ATTRIBUTES.items():
+        station[attribute] = sum(1 for port in ports if port["status"] == status)
+    return station
+
+
+def _invalidate(station_id):
+    """Drop this process's cached version of a station after writing its metadata."""
+    version_cache.invalidate(station_id)
+
+
+def _query_geo_cell(cell, status=None):
+    """Station METADATA items whose geohash starts with `cell`."""
+    key_condition = Key("geoCell").eq(cell[:GEO_PARTITION_PRECISION])
+    if len(cell) > GEO_PARTITION_PRECISION:
+        key_condition = key_condition & Key("geohash").begins_with(cell)
+    kwargs = {"IndexName": "geo-index", "KeyConditionExpression": key_condition}
+    if status:
+        kwargs["FilterExpression"] = Attr("status").eq(status)
+    return list(ItemStream(stations_table, "query", kwargs))
+
+
 def _format_station(item):
     return {
         "stationId": item["stationId"],
@@ -166,11 +403,17 @@ def _format_station(item):
         "powerKw": float(item["powerKw"]),
         "tariffPerKwh": float(item["tariffPerKwh"]),
         "status": item["status"],
+        "version": int(item.get("version", 1)),
+        **{attribute: _optional_int(item.get(attribute)) for attribute in PORT_COUNTER_ATTRIBUTES.values()},
         "createdAt": item.get("createdAt"),
         "updatedAt": item.get("updatedAt"),
     }
 
 
+def _optional_int(value):
+    return int(value) if value is not None else None
+
+
 def _format_port(item):
     return {
         "portId": item["portId"],
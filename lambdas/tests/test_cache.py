@@ -0,0 +1,79 @@
+"""TTLCache expiry, LRU eviction and counters, driven by a fake clock."""
+
+from shared.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=30, clock=clock)
+    cache.put("a", 1)
+
+    clock.now = 29.9
+    assert cache.get("a") == 1
+    clock.now = 30.0
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_put_restarts_the_ttl_but_get_does_not():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=30, clock=clock)
+    cache.put("a", 1)
+    clock.now = 20
+    cache.get("a")
+    cache.put("b", 2)
+
+    clock.now = 35
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=30, clock=FakeClock())
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_or_load_reloads_after_expiry_and_does_not_cache_none():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=30, clock=clock)
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        return None if key == "missing" else key.upper()
+
+    assert cache.get_or_load("a", loader) == "A"
+    assert cache.get_or_load("a", loader) == "A"
+    clock.now = 31
+    assert cache.get_or_load("a", loader) == "A"
+    assert cache.get_or_load("missing", loader) is None
+    assert cache.get_or_load("missing", loader) is None
+
+    assert loads == ["a", "a", "missing", "missing"]
+
+
+def test_invalidate_drops_the_entry():
+    cache = TTLCache(max_size=10, ttl_seconds=30, clock=FakeClock())
+    cache.put("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("never-cached")
+
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,53 @@
+"""covering_cells must cover every point of the search circle."""
+
+import math
+import random
+
+import pytest
+
+from shared.geo import (
+    EARTH_RADIUS_KM, GEO_PARTITION_PRECISION, MAX_QUERY_PRECISION,
+    covering_cells, distance_km, encode,
+)
+
+
+def _points_in_circle(rng, latitude, longitude, radius_km, count):
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lon_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude)))), 180.0)
+    points = []
+    while len(points) < count:
+        lat = rng.uniform(latitude - lat_delta, latitude + lat_delta)
+        lon = rng.uniform(longitude - lon_delta, longitude + lon_delta)
+        lon = (lon + 180.0) % 360.0 - 180.0
+        if -90 <= lat <= 90 and distance_km(latitude, longitude, lat, lon) <= radius_km:
+            points.append((lat, lon))
+    return points
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_km", [
+    (52.52, 13.405, 0.5),
+    (52.52, 13.405, 5),
+    (40.7128, -74.006, 25),
+    (-33.87, 151.21, 80),
+    (0.0, 0.0, 3),           # all four hemispheres meet here
+    (64.15, -21.94, 10),     # narrow cells far north
+    (-16.5, 179.99, 15),     # across the antimeridian
+])
+def test_every_point_in_the_circle_is_covered(latitude, longitude, radius_km):
+    cells = covering_cells(latitude, longitude, radius_km)
+    rng = random.Random(f"{latitude},{longitude},{radius_km}")
+
+    for lat, lon in _points_in_circle(rng, latitude, longitude, radius_km, 500):
+        geohash = encode(lat, lon)
+        assert any(geohash.startswith(cell) for cell in cells), (lat, lon, geohash)
+
+
+def test_cell_count_and_precision_bounds():
+    fine = covering_cells(52.52, 13.405, 0.1, max_cells=9)
+    assert len(fine) <= 9
+    assert {len(cell) for cell in fine} == {MAX_QUERY_PRECISION}
+
+    # Too wide for max_cells at any query precision: fall back to partition cells.
+    coarse = covering_cells(52.52, 13.405, 150, max_cells=9)
+    assert {len(cell) for cell in coarse} == {GEO_PARTITION_PRECISION}
+    assert len(coarse) > 9
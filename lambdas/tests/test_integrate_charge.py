@@ -0,0 +1,65 @@
+"""integrate_charge must be the limit of stepping through ticks."""
+
+from decimal import Decimal
+
+import pytest
+
+from charging_simulator import handler as simulator
+
+
+def _state(charge_percent, battery_capacity, power_kw):
+    item = {
+        "sessionId": "sess-1", "userId": "user-1", "stationId": "station-1", "status": "IN_PROGRESS",
+        "chargePercent": Decimal(str(charge_percent)), "batteryCapacityKwh": Decimal(str(battery_capacity)),
+    }
+    return simulator.SessionState(item, {"powerKw": Decimal(str(power_kw))}, 1)
+
+
+def _step(state, seconds):
+    """Tick a single session until `seconds` have passed; returns the 80% crossing time or None."""
+    crossed_80 = None
+    for tick in range(round(seconds / simulator.TICK_INTERVAL_SECONDS)):
+        if state.status == "COMPLETED":
+            break
+        _, notifications = simulator._simulate_tick(state, state.station_power_kw)
+        if crossed_80 is None and any(n["type"] == "CHARGE_80_PERCENT" for n in notifications):
+            crossed_80 = (tick + 1) * simulator.TICK_INTERVAL_SECONDS
+    return crossed_80
+
+
+def test_integrate_charge_equals_ticks_inside_one_band():
+    state = _state(10.0, 60, 50)
+    _step(state, 60)
+
+    percent, energy, seconds_to_80, seconds_to_full = simulator.integrate_charge(10.0, 60, 50, 60)
+
+    assert percent == pytest.approx(state.charge_percent, abs=1e-9)
+    assert energy == pytest.approx(state.energy_consumed_kwh, abs=1e-9)
+    assert seconds_to_80 is None and seconds_to_full is None
+
+
+@pytest.mark.parametrize("start, capacity, power, seconds", [
+    (65.0, 40, 150, 600),
+    (78.5, 75, 350, 900),
+    (88.0, 60, 22, 3600),
+    (5.0, 100, 350, 1800),
+])
+def test_integrate_charge_is_the_limit_of_fine_ticks(monkeypatch, start, capacity, power, seconds):
+    # Ticks take the power factor at the start of each tick, so they only
+    # converge on the closed form as the tick shrinks.
+    monkeypatch.setattr(simulator, "TICK_INTERVAL_SECONDS", 0.05)
+    state = _state(start, capacity, power)
+    crossed_80 = _step(state, seconds)
+
+    percent, energy, seconds_to_80, seconds_to_full = simulator.integrate_charge(start, capacity, power, seconds)
+
+    assert percent == pytest.approx(min(state.charge_percent, 100.0), abs=0.01)
+    if percent < 100:
+        assert energy == pytest.approx(state.energy_consumed_kwh, rel=1e-3)
+    else:
+        assert state.status == "COMPLETED"
+        assert seconds_to_full is not None
+    if seconds_to_80 is None:
+        assert crossed_80 is None
+    else:
+        assert crossed_80 == pytest.approx(seconds_to_80, abs=0.1)
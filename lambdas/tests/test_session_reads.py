@@ -0,0 +1,92 @@
+"""Session reads include the progress the simulator has carried over but not written yet."""
+
+import json
+from decimal import Decimal
+
+import pytest
+
+from session_service import handler as session_service
+from shared.db import simulator_bucket
+
+
+def _session(session_id, station_id, status="IN_PROGRESS", updated_at="t1"):
+    return {
+        "PK": f"SESSION#{session_id}", "SK": "METADATA", "sessionId": session_id, "userId": "user-1",
+        "stationId": station_id, "portId": "port-1", "status": status,
+        "chargePercent": Decimal("40"), "energyConsumedKwh": Decimal("10"), "totalCost": Decimal("3.5"),
+        "updatedAt": updated_at,
+    }
+
+
+class FakeSessions:
+    """Sessions table holding session items and SIMULATOR#CARRY chunks."""
+
+    def __init__(self, sessions, carried):
+        self.sessions = {s["sessionId"]: s for s in sessions}
+        self.carry_items = {}
+        for session_id, (station_id, entry) in carried.items():
+            sort_key = f"BUCKET#{simulator_bucket(station_id):02d}#CHUNK#0000"
+            chunk = self.carry_items.setdefault(sort_key, {
+                "PK": "SIMULATOR#CARRY", "SK": sort_key, "savedAt": "s1", "sessions": {},
+            })
+            chunk["sessions"][session_id] = entry
+        self.carry_queries = 0
+
+    def get_item(self, Key, **kwargs):
+        item = self.sessions.get(Key["PK"].split("#", 1)[1])
+        return {"Item": dict(item)} if item else {}
+
+    def query(self, **kwargs):
+        if "IndexName" in kwargs:
+            return {"Items": [dict(s) for s in self.sessions.values()]}
+        self.carry_queries += 1
+        # Key("PK").eq(...) & Key("SK").begins_with(prefix)
+        prefix = kwargs["KeyConditionExpression"].get_expression()["values"][1].get_expression()["values"][1]
+        return {"Items": [item for sk, item in self.carry_items.items() if sk.startswith(prefix)]}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    sessions = [
+        _session("sess-1", "station-1"),
+        _session("sess-2", "station-2", updated_at="t2"),
+        _session("sess-3", "station-3", status="COMPLETED"),
+        _session("sess-4", "station-1"),
+    ]
+    carried = {
+        "sess-1": ("station-1", [Decimal("47.5"), Decimal("14.1"), Decimal("4.94"), "t1"]),
+        # Computed from an older copy of sess-2: the stored item is newer.
+        "sess-2": ("station-2", [Decimal("60"), Decimal("20"), Decimal("7"), "t1"]),
+        "sess-3": ("station-3", [Decimal("99"), Decimal("30"), Decimal("10.5"), "t1"]),
+    }
+    fake = FakeSessions(sessions, carried)
+    monkeypatch.setattr(session_service, "sessions_table", fake)
+    return fake
+
+
+def _body(resp):
+    assert resp["statusCode"] == 200
+    return json.loads(resp["body"])
+
+
+def test_get_merges_carried_progress(table):
+    session = _body(session_service.handle_get({"sessionId": "sess-1"}))["session"]
+
+    assert (session["chargePercent"], session["energyConsumedKwh"], session["totalCost"]) == (47.5, 14.1, 4.94)
+
+
+@pytest.mark.parametrize("session_id", ["sess-2", "sess-3", "sess-4"])
+def test_get_keeps_stored_progress_without_a_current_entry(table, session_id):
+    session = _body(session_service.handle_get({"sessionId": session_id}))["session"]
+
+    assert session["chargePercent"] == 40.0
+
+
+def test_history_reads_each_bucket_once(table):
+    sessions = _body(session_service.handle_history({"userId": "user-1"}))["sessions"]
+
+    assert {s["sessionId"]: s["chargePercent"] for s in sessions} == {
+        "sess-1": 47.5, "sess-2": 40.0, "sess-3": 40.0, "sess-4": 40.0,
+    }
+    # sess-3 is not active; sess-1 and sess-4 share station-1's bucket.
+    assert table.carry_queries == len({simulator_bucket("station-1"), simulator_bucket("station-2")})
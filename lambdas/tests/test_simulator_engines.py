@@ -0,0 +1,65 @@
+"""The vectorized tick engine must agree with the reference per-session loop."""
+
+import copy
+import random
+from decimal import Decimal
+
+import pytest
+
+from charging_simulator import handler as simulator
+
+
+def _fleet(seed, session_count=900, station_count=300):
+    rng = random.Random(seed)
+    stations = {
+        f"station-{i}": {"powerKw": Decimal(rng.choice(["22", "50", "150", "350"]))}
+        for i in range(station_count)
+    }
+    sessions = [
+        {
+            "sessionId": f"sess-{i}",
+            "userId": f"user-{i}",
+            "stationId": f"station-{i % station_count}",
+            "portId": f"port-{i}",
+            "status": rng.choice(["STARTED", "IN_PROGRESS"]),
+            "chargePercent": Decimal(str(round(rng.uniform(0, 100), 2))),
+            "energyConsumedKwh": Decimal("1.2345"),
+            "totalCost": Decimal("0.43"),
+            "tariffPerKwh": Decimal("0.35"),
+            "batteryCapacityKwh": Decimal(rng.choice(["40", "60", "75", "100"])),
+        }
+        for i in range(session_count)
+    ]
+    ticks = [rng.choice([6, 6, 12, 18]) for _ in sessions]
+    return stations, sessions, ticks
+
+
+def _run(engine, fleet):
+    stations, sessions, ticks = copy.deepcopy(fleet)
+    load_index = simulator._build_station_load_index(sessions)
+    batch = [
+        simulator.SessionState(s, stations[s["stationId"]], len(load_index[s["stationId"]]))
+        for s in sessions
+    ]
+    for state, count in zip(batch, ticks):
+        state.ticks = count
+    notifications = simulator.TICK_ENGINES[engine](batch)
+    updates = [state.to_update("2026-01-01T00:00:00+00:00") for state in batch]
+    return updates, notifications
+
+
+@pytest.mark.parametrize("allocation", ["redistribute", "even"])
+@pytest.mark.parametrize("seed", [1, 7])
+def test_vectorized_engine_matches_reference(monkeypatch, allocation, seed):
+    monkeypatch.setattr(simulator, "POWER_ALLOCATION", allocation)
+    fleet = _fleet(seed)
+
+    reference_updates, reference_notifications = _run("reference", fleet)
+    vectorized_updates, vectorized_notifications = _run("vectorized", fleet)
+
+    assert vectorized_updates == reference_updates
+    assert vectorized_notifications == reference_notifications
+    # The fleet has to exercise every notification for the comparison to mean anything.
+    assert {n["type"] for n in reference_notifications} == {
+        "CHARGING_STARTED", "CHARGE_80_PERCENT", "CHARGING_COMPLETED",
+    }
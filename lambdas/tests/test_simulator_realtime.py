@@ -0,0 +1,35 @@
+"""Realtime mode writes every tick by default instead of applying the batch write policy."""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from charging_simulator import handler as simulator
+
+
+def _ticked_state(now):
+    item = {
+        "sessionId": "sess-1", "userId": "user-1", "stationId": "station-1", "status": "IN_PROGRESS",
+        "chargePercent": Decimal("40"), "updatedAt": (now - timedelta(seconds=10)).isoformat(),
+    }
+    state = simulator.SessionState(item, {"powerKw": Decimal("22")}, 1)
+    state.charge_percent = 40.1
+    return state
+
+
+def test_batch_policy_holds_back_a_small_change():
+    now = datetime.now(timezone.utc)
+    assert not simulator._should_persist(_ticked_state(now), now, set())
+
+
+def test_realtime_persists_every_tick():
+    now = datetime.now(timezone.utc)
+    results = simulator._new_results()
+    carry = {}
+
+    writer = simulator._stage_writes(
+        [_ticked_state(now)], [], results, carry, simulator.REALTIME_PERSIST_MIN_CHARGE_DELTA
+    )
+
+    assert results["persistence"]["suppressed"] == 0
+    assert carry == {}
+    assert len(writer._saves) == 1
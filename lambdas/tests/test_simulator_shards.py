@@ -0,0 +1,74 @@
+"""Coordinator handling of shard invokes that fail."""
+
+import boto3
+import pytest
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+from botocore.stub import Stubber
+
+from charging_simulator import handler as simulator
+from shared.db import simulator_bucket
+
+
+class Context:
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:simulator"
+
+
+@pytest.fixture
+def lambda_stub(monkeypatch):
+    client = boto3.client("lambda", region_name="us-east-1")
+    monkeypatch.setattr(simulator, "lambda_client", client)
+    monkeypatch.setattr(simulator, "SIMULATOR_DISPATCH", "lambda")
+    monkeypatch.setattr(simulator, "_log_error", lambda *args, **kwargs: None)
+    with Stubber(client) as stub:
+        yield stub
+
+
+@pytest.fixture
+def saved_cursors(monkeypatch):
+    stations = [f"station-{i}" for i in range(40)]
+    sessions = [{"sessionId": f"sess-{i}", "stationId": station} for i, station in enumerate(stations)]
+    saved = []
+    monkeypatch.setattr(simulator, "_iter_active_session_pages", lambda: iter([sessions[:25], sessions[25:]]))
+    monkeypatch.setattr(simulator, "_load_cursor", lambda buckets: {
+        "stations": {s: 2 for s in stations if simulator_bucket(s) in buckets},
+        "savedAt": "2026-01-01T00:00:00+00:00", "keys": [],
+    })
+    monkeypatch.setattr(simulator, "_save_cursor", lambda deferred, previous: saved.append(deferred))
+    return stations, saved
+
+
+def test_rejected_invoke_owes_the_shard_a_window(lambda_stub, saved_cursors):
+    stations, saved = saved_cursors
+    lambda_stub.add_client_error("invoke", "TooManyRequestsException", http_status_code=429)
+
+    results = simulator._run_coordinator(1, "vectorized", None, "batch", Context())
+
+    assert results["deferredShards"] == [0]
+    assert results["shards"][0]["catchUpStations"] == len(stations)
+    assert saved == [{station: 3 for station in stations}]
+
+
+def test_rejected_invoke_only_touches_its_own_buckets(saved_cursors):
+    stations, saved = saved_cursors
+
+    owed = simulator._defer_shard(1, 4)
+
+    mine = {s for s in stations if simulator_bucket(s) % 4 == 1}
+    assert owed == len(mine)
+    assert set(saved[0]) == mine
+
+
+def test_ambiguous_invoke_failure_is_only_deferred(lambda_stub, saved_cursors):
+    _, saved = saved_cursors
+    lambda_stub.add_client_error("invoke", "ServiceException", http_status_code=500)
+
+    results = simulator._run_coordinator(1, "vectorized", None, "batch", Context())
+
+    assert results["deferredShards"] == [0]
+    assert "catchUpStations" not in results["shards"][0]
+    assert saved == []
+
+
+def test_worker_never_started_only_for_errors_before_the_request_ran():
+    assert simulator._worker_never_started(ConnectTimeoutError(endpoint_url="https://lambda"))
+    assert not simulator._worker_never_started(ReadTimeoutError(endpoint_url="https://lambda"))
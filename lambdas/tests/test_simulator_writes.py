@@ -0,0 +1,135 @@
+"""Shapes of the low-level DynamoDB requests the simulator sends, checked against the service model."""
+
+from decimal import Decimal
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from charging_simulator import handler as simulator
+
+
+@pytest.fixture
+def stubber(monkeypatch):
+    client = boto3.client("dynamodb", region_name="us-east-1")
+    monkeypatch.setattr(simulator, "dynamodb_client", client)
+    monkeypatch.setattr(simulator, "SESSIONS_TABLE", "Sessions")
+    monkeypatch.setattr(simulator, "STATIONS_TABLE", "Stations")
+    monkeypatch.setattr(simulator, "backoff", lambda attempt: None)
+    with Stubber(client) as stub:
+        yield stub
+        stub.assert_no_pending_responses()
+
+
+def _session(session_id, station_id="station-1", port_id="port-1"):
+    return {
+        "PK": f"SESSION#{session_id}", "SK": "METADATA",
+        "sessionId": session_id, "stationId": station_id, "portId": port_id,
+    }
+
+
+def _expected_session_update(session_id, values, names):
+    return {
+        "TableName": "Sessions",
+        "Key": {"PK": {"S": f"SESSION#{session_id}"}, "SK": {"S": "METADATA"}},
+        "UpdateExpression": "SET " + ", ".join(f"#a{n} = :v{n}" for n in range(len(names))),
+        "ConditionExpression": "#status IN (:started, :in_progress)",
+        "ExpressionAttributeNames": {"#status": "status", **{f"#a{n}": name for n, name in enumerate(names)}},
+        "ExpressionAttributeValues": {
+            ":started": {"S": "STARTED"}, ":in_progress": {"S": "IN_PROGRESS"},
+            **{f":v{n}": value for n, value in enumerate(values)},
+        },
+    }
+
+
+def test_update_sessions_sends_conditional_typed_updates(stubber):
+    changes = {"chargePercent": Decimal("42.5"), "updatedAt": "2026-01-01T00:00:00+00:00"}
+    stubber.add_response("update_item", {}, _expected_session_update(
+        "sess-1",
+        [{"N": "42.5"}, {"S": "2026-01-01T00:00:00+00:00"}],
+        ["chargePercent", "updatedAt"],
+    ))
+
+    assert simulator._update_sessions([(_session("sess-1"), changes)]) == (1, {}, [])
+
+
+def test_update_sessions_retries_throttles_and_reports_conflicts(stubber):
+    changes = {"updatedAt": "now"}
+    stubber.add_client_error("update_item", "ProvisionedThroughputExceededException")
+    stubber.add_response("update_item", {})
+    stubber.add_client_error("update_item", "ConditionalCheckFailedException")
+    stubber.add_client_error("update_item", "ValidationException", "bad")
+
+    requests, failed, conflicts = simulator._update_sessions([
+        (_session("sess-1"), changes),
+        (_session("sess-2"), changes),
+        (_session("sess-3"), changes),
+    ])
+
+    assert requests == 4
+    assert conflicts == ["sess-2"]
+    assert list(failed) == ["sess-3"]
+
+
+def _completion(session_id, station_id, port_id):
+    return _session(session_id, station_id, port_id), {"status": "COMPLETED", "updatedAt": "now"}
+
+
+def _expected_port_update(station_id, port_id):
+    return {"Update": {
+        "TableName": "Stations",
+        "Key": {"PK": {"S": f"STATION#{station_id}"}, "SK": {"S": f"PORT#{port_id}"}},
+        "UpdateExpression": "SET #status = :to, updatedAt = :now",
+        "ConditionExpression": "#status = :from",
+        "ExpressionAttributeNames": {"#status": "status"},
+        "ExpressionAttributeValues": {":to": {"S": "FREE"}, ":from": {"S": "CHARGING"}, ":now": ANY},
+    }}
+
+
+def _expected_counter_update(station_id, count):
+    return {"Update": {
+        "TableName": "Stations",
+        "Key": {"PK": {"S": f"STATION#{station_id}"}, "SK": {"S": "METADATA"}},
+        "UpdateExpression": "ADD #c0 :d0, #c1 :d1 SET #version = if_not_exists(#version, :one) + :one",
+        "ConditionExpression": "attribute_exists(PK)",
+        "ExpressionAttributeNames": {"#c0": "chargingPorts", "#c1": "freePorts", "#version": "version"},
+        "ExpressionAttributeValues": {":d0": {"N": str(-count)}, ":d1": {"N": str(count)}, ":one": {"N": "1"}},
+    }}
+
+
+def _expected_completion(session_id):
+    return {"Update": _expected_session_update(
+        session_id, [{"S": "COMPLETED"}, {"S": "now"}], ["status", "updatedAt"],
+    )}
+
+
+def test_completion_transaction_frees_ports_and_sums_counters(stubber):
+    stubber.add_response("transact_write_items", {}, {"TransactItems": [
+        _expected_completion("sess-1"),
+        _expected_port_update("station-1", "port-1"),
+        _expected_completion("sess-2"),
+        _expected_port_update("station-1", "port-2"),
+        _expected_counter_update("station-1", 2),
+    ]})
+
+    result = simulator._write_completion_transaction([
+        _completion("sess-1", "station-1", "port-1"),
+        _completion("sess-2", "station-1", "port-2"),
+    ])
+
+    assert result == (1, {}, [])
+
+
+def test_completion_transaction_drops_a_port_that_is_no_longer_charging(stubber):
+    stubber.add_client_error(
+        "transact_write_items",
+        "TransactionCanceledException",
+        modeled_fields={"CancellationReasons": [
+            {"Code": "None"}, {"Code": "ConditionalCheckFailed"}, {"Code": "None"},
+        ]},
+    )
+    stubber.add_response("transact_write_items", {}, {"TransactItems": [_expected_completion("sess-1")]})
+
+    result = simulator._write_completion_transaction([_completion("sess-1", "station-1", "port-1")])
+
+    assert result == (2, {}, [])
@@ -0,0 +1,60 @@
+"""Paging of station_service list."""
+
+import json
+
+import pytest
+
+from station_service import handler as station_service
+
+
+class FakeIndex:
+    """
+    entityType-index over station METADATA items. Like DynamoDB, it returns
+    a LastEvaluatedKey whenever Limit is reached.
+    """
+
+    def __init__(self, count):
+        self.items = [
+            {"PK": f"STATION#s{n:03d}", "SK": "METADATA", "entityType": "STATION", "stationId": f"s{n:03d}",
+             "name": f"Station {n}", "address": "Main St", "latitude": 52.5, "longitude": 13.4,
+             "totalPorts": 2, "powerKw": 50, "tariffPerKwh": 0.35, "status": "ACTIVE"}
+            for n in range(count)
+        ]
+
+    def query(self, Limit, ExclusiveStartKey=None, **kwargs):
+        start = 0
+        if ExclusiveStartKey:
+            start = next(n for n, item in enumerate(self.items)
+                         if item["stationId"] == ExclusiveStartKey["stationId"]) + 1
+        page = self.items[start:start + Limit]
+        response = {"Items": page}
+        if len(page) == Limit:
+            last = page[-1]
+            response["LastEvaluatedKey"] = {k: last[k] for k in ("PK", "SK", "entityType", "stationId")}
+        return response
+
+
+def _pages(monkeypatch, count, limit):
+    monkeypatch.setattr(station_service, "stations_table", FakeIndex(count))
+    pages, cursor = [], None
+    while True:
+        resp = station_service.handle_list({"limit": limit, "cursor": cursor})
+        assert resp["statusCode"] == 200
+        body = json.loads(resp["body"])
+        pages.append([s["stationId"] for s in body["stations"]])
+        cursor = body["nextCursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("count, limit, sizes", [
+    (10, 5, [5, 5]),
+    (11, 5, [5, 5, 1]),
+    (4, 5, [4]),
+    (0, 5, [0]),
+])
+def test_last_page_has_no_cursor(monkeypatch, count, limit, sizes):
+    pages = _pages(monkeypatch, count, limit)
+
+    assert [len(page) for page in pages] == sizes
+    assert [s for page in pages for s in page] == [f"s{n:03d}" for n in range(count)]
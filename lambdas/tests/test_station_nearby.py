@@ -0,0 +1,49 @@
+"""Parameter validation of station_service nearby search."""
+
+import json
+
+import pytest
+
+from station_service import handler as station_service
+
+
+@pytest.fixture(autouse=True)
+def no_geo_queries(monkeypatch):
+    monkeypatch.setattr(station_service, "_query_geo_cell", lambda cell, status=None: [])
+
+
+def _nearby(**params):
+    resp = station_service.handle_nearby({"latitude": 52.52, "longitude": 13.405, **params})
+    return resp["statusCode"], json.loads(resp["body"]).get("error", "")
+
+
+@pytest.mark.parametrize("params", [
+    {}, {"radiusKm": ""}, {"radiusKm": "2.5"}, {"radiusKm": 50}, {"limit": ""}, {"limit": "5"},
+    {"minFreePorts": 0}, {"minFreePorts": "3"},
+])
+def test_valid_parameters(params):
+    assert _nearby(**params)[0] == 200
+
+
+@pytest.mark.parametrize("params, field", [
+    ({"radiusKm": 0}, "radiusKm"),
+    ({"radiusKm": "0"}, "radiusKm"),
+    ({"radiusKm": "far"}, "radiusKm"),
+    ({"radiusKm": 51}, "radiusKm"),
+    ({"limit": "many"}, "limit"),
+    ({"limit": 0}, "limit"),
+    ({"limit": 51}, "limit"),
+    ({"minFreePorts": -1}, "minFreePorts"),
+    ({"minFreePorts": "1.5"}, "minFreePorts"),
+    ({"minFreePorts": True}, "minFreePorts"),
+])
+def test_each_bad_parameter_gets_its_own_error(params, field):
+    status, error = _nearby(**params)
+    assert status == 400
+    assert error.startswith(field)
+
+
+def test_missing_coordinates():
+    resp = station_service.handle_nearby({"latitude": "north"})
+    assert resp["statusCode"] == 400
+    assert "latitude and longitude" in json.loads(resp["body"])["error"]
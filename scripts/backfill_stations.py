@@ -0,0 +1,72 @@
+"""
+Backfill derived attributes on existing station METADATA items.
+
+Stations created before an attribute was introduced lack it and are missing
+from the indexes keyed on it. The script scans the Stations table once and
+sets only the attributes an item does not have yet, so it is safe to re-run.
+Port counters are recounted from the port items; run it in a quiet period,
+as a port changing status during the recount is not reflected.
+
+Usage:
+    STATIONS_TABLE=Stations-dev python scripts/backfill_stations.py
+    STATIONS_TABLE=Stations-dev python scripts/backfill_stations.py --dry-run
+"""
+
+import argparse
+import os
+import sys
+
+from boto3.dynamodb.conditions import Attr
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambdas"))
+
+from shared.db import get_stations_table, parallel_scan, query_pk  # noqa: E402
+from shared.geo import geo_attributes  # noqa: E402
+from shared.models import PORT_COUNTER_ATTRIBUTES  # noqa: E402
+
+
+def missing_attributes(table, item):
+    """Attributes a METADATA item should carry but does not."""
+    missing = {}
+    if "entityType" not in item:
+        missing["entityType"] = "STATION"
+    if "geohash" not in item or "geoCell" not in item:
+        missing.update(geo_attributes(item["latitude"], item["longitude"]))
+    if any(attribute not in item for attribute in PORT_COUNTER_ATTRIBUTES.values()):
+        ports = query_pk(table, item["PK"], "PORT#")
+        for status, attribute in PORT_COUNTER_ATTRIBUTES.items():
+            missing[attribute] = sum(1 for port in ports if port["status"] == status)
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill derived attributes on station METADATA items")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    table = get_stations_table()
+    scanned = updated = 0
+    for item in parallel_scan(table, filter_expression=Attr("SK").eq("METADATA")):
+        scanned += 1
+        missing = missing_attributes(table, item)
+        if not missing:
+            continue
+        updated += 1
+        print(f"{item['stationId']}: {', '.join(sorted(missing))}")
+        if args.dry_run:
+            continue
+        names = {f"#a{i}": name for i, name in enumerate(missing)}
+        values = {f":v{i}": value for i, value in enumerate(missing.values())}
+        table.update_item(
+            Key={"PK": item["PK"], "SK": "METADATA"},
+            UpdateExpression="SET " + ", ".join(f"{n} = {v}" for n, v in zip(names, values)),
+            ConditionExpression="attribute_exists(PK)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+    print(f"Scanned {scanned} stations, {'would update' if args.dry_run else 'updated'} {updated}")
+
+
+if __name__ == "__main__":
+    main()
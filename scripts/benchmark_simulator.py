@@ -0,0 +1,537 @@
+"""
+Synthetic fleet benchmark for the Charging Simulator Lambda.
+
+Generates fleets of stations and active sessions into an in-memory stand-in
+for the Sessions, Stations and ErrorLogs tables, drives
+charging_simulator.handler.lambda_handler end to end and appends the
+measurements to a JSON file so runs can be compared over time.
+
+Usage:
+    python scripts/benchmark_simulator.py
+    python scripts/benchmark_simulator.py --fleet 1000:10000 --fleet 10000:200000
+    python scripts/benchmark_simulator.py --engine reference --latency-ms 5
+    python scripts/benchmark_simulator.py --micro 50000
+"""
+
+import argparse
+import bisect
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "lambdas"))
+
+os.environ.setdefault("AWS_REGION_NAME", "us-east-1")
+os.environ.setdefault("SESSIONS_TABLE", "Sessions")
+os.environ.setdefault("STATIONS_TABLE", "Stations")
+os.environ.setdefault("ERROR_LOGS_TABLE", "ErrorLogs")
+
+from charging_simulator import handler as simulator  # noqa: E402
+
+DEFAULT_FLEETS = ["100:1000", "1000:10000", "10000:50000"]
+QUERY_PAGE_SIZE = 1000
+
+_deserializer = TypeDeserializer()
+
+
+class CallStats:
+    """Thread-safe counters for calls made against the in-memory backend."""
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = {}
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def record(self, operation):
+        started = time.perf_counter()
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.calls[operation] = self.calls.get(operation, 0) + 1
+                self.seconds += elapsed
+
+
+class InMemoryTable:
+    """The subset of the boto3 Table resource used by the simulator."""
+
+    def __init__(self, name, stats):
+        self.name = name
+        self.stats = stats
+        self.items = {}
+        self._version = 0
+        self._index_cache = {}
+        self._lock = threading.RLock()
+        self.meta = types.SimpleNamespace(client=InMemoryResourceClient(self))
+
+    def _key(self, key):
+        return key["PK"], key["SK"]
+
+    def put_item(self, Item, **kwargs):
+        with self.stats.record(f"{self.name}.PutItem"):
+            self._put(Item)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        with self.stats.record(f"{self.name}.GetItem"):
+            item = self.items.get(self._key(Key))
+        return {"Item": dict(item)} if item else {}
+
+    def delete_item(self, Key, **kwargs):
+        with self.stats.record(f"{self.name}.DeleteItem"):
+            with self._lock:
+                self.items.pop(self._key(Key), None)
+                self._version += 1
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, **kwargs):
+        with self.stats.record(f"{self.name}.UpdateItem"):
+            self._update(Key, UpdateExpression, ExpressionAttributeValues or {},
+                         ExpressionAttributeNames or {})
+        return {}
+
+    def query(self, KeyConditionExpression, IndexName=None, ExclusiveStartKey=None,
+              Limit=None, **kwargs):
+        with self.stats.record(f"{self.name}.Query"):
+            expression = KeyConditionExpression.get_expression()
+            attribute = expression["values"][0].name
+            value = expression["values"][1]
+            matches = self._matching_keys(attribute, value)
+            start = 0
+            if ExclusiveStartKey:
+                start = bisect.bisect_right(matches, self._key(ExclusiveStartKey))
+            page_size = min(Limit or QUERY_PAGE_SIZE, QUERY_PAGE_SIZE)
+            page = matches[start:start + page_size]
+            resp = {"Items": [dict(self.items[key]) for key in page], "Count": len(page)}
+            if start + page_size < len(matches):
+                resp["LastEvaluatedKey"] = {"PK": page[-1][0], "SK": page[-1][1]}
+        return resp
+
+    def _matching_keys(self, attribute, value):
+        """Sorted keys of items whose `attribute` equals `value`, cached until the next write."""
+        cached = self._index_cache.get((attribute, value))
+        if cached and cached[0] == self._version:
+            return cached[1]
+        matches = sorted(key for key, item in self.items.items() if item.get(attribute) == value)
+        self._index_cache[(attribute, value)] = (self._version, matches)
+        return matches
+
+    def _put(self, item):
+        with self._lock:
+            self.items[self._key(item)] = dict(item)
+            self._version += 1
+
+    def _check(self, key, condition, values, names):
+        """Evaluate a simple `path = :v` or `path IN (:a, :b)` condition."""
+        if not condition:
+            return True
+        if condition == "attribute_exists(PK)":
+            return self._key(key) in self.items
+        item = self.items.get(self._key(key), {})
+        if " IN " in condition:
+            path, candidates = condition.split(" IN ")
+            allowed = [values[v.strip()] for v in candidates.strip(" ()").split(",")]
+        else:
+            path, candidate = (part.strip() for part in condition.split("="))
+            allowed = [values[candidate]]
+        return item.get(names.get(path.strip(), path.strip())) in allowed
+
+    def _update(self, key, expression, values, names):
+        clauses = re.findall(r"(SET|ADD) (.+?)(?= SET | ADD |$)", expression)
+        assert clauses, f"Unsupported update: {expression}"
+        with self._lock:
+            item = self.items.setdefault(self._key(key), dict(key))
+            self._version += 1
+            for action, clause in clauses:
+                for assignment in re.split(r",(?![^(]*\))", clause):
+                    if action == "SET":
+                        path, value = (part.strip() for part in assignment.split("=", 1))
+                        attribute = names.get(path, path)
+                        increment = re.fullmatch(r"if_not_exists\((\S+), (:\w+)\) \+ (:\w+)", value)
+                        if increment:
+                            item[attribute] = item.get(attribute, values[increment[2]]) + values[increment[3]]
+                        else:
+                            item[attribute] = values[value]
+                    else:
+                        path, value = assignment.split()
+                        attribute = names.get(path, path)
+                        item[attribute] = item.get(attribute, 0) + values[value]
+
+
+class InMemoryResourceClient:
+    """table.meta.client of a boto3 resource: takes plain Python values, not DynamoDB JSON."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def batch_write_item(self, RequestItems):
+        with self.table.stats.record("BatchWriteItem"):
+            for request in RequestItems[self.table.name]:
+                if "PutRequest" in request:
+                    self.table._put(request["PutRequest"]["Item"])
+                else:
+                    with self.table._lock:
+                        self.table.items.pop(self.table._key(request["DeleteRequest"]["Key"]), None)
+                        self.table._version += 1
+        return {"UnprocessedItems": {}}
+
+    def batch_get_item(self, RequestItems):
+        spec = RequestItems[self.table.name]
+        with self.table.stats.record("BatchGetItem"):
+            items = [self.table.items.get(self.table._key(key)) for key in spec["Keys"]]
+        return {"Responses": {self.table.name: [dict(item) for item in items if item]}, "UnprocessedKeys": {}}
+
+
+class InMemoryClient:
+    """The subset of the low-level DynamoDB client used by the simulator."""
+
+    def __init__(self, tables, stats):
+        self.tables = tables
+        self.stats = stats
+        self._transaction_lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        with self.stats.record("BatchWriteItem"):
+            for table_name, requests in RequestItems.items():
+                for request in requests:
+                    self.tables[table_name]._put(_deserialize(request["PutRequest"]["Item"]))
+        return {"UnprocessedItems": {}}
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, **kwargs):
+        with self.stats.record("UpdateItem"):
+            table = self.tables[TableName]
+            key = _deserialize(Key)
+            values = _deserialize(ExpressionAttributeValues or {})
+            names = ExpressionAttributeNames or {}
+            with table._lock:
+                if not table._check(key, ConditionExpression, values, names):
+                    raise ClientError(
+                        {"Error": {"Code": "ConditionalCheckFailedException",
+                                   "Message": "The conditional request failed"}},
+                        "UpdateItem",
+                    )
+                table._update(key, UpdateExpression, values, names)
+        return {}
+
+    def transact_write_items(self, TransactItems):
+        with self.stats.record("TransactWriteItems"), self._transaction_lock:
+            reasons = []
+            for action in TransactItems:
+                update = action.get("Update")
+                passed = update is None or self.tables[update["TableName"]]._check(
+                    _deserialize(update["Key"]),
+                    update.get("ConditionExpression"),
+                    _deserialize(update.get("ExpressionAttributeValues", {})),
+                    update.get("ExpressionAttributeNames", {}),
+                )
+                reasons.append({"Code": "None" if passed else "ConditionalCheckFailed"})
+            if any(r["Code"] != "None" for r in reasons):
+                raise ClientError(
+                    {"Error": {"Code": "TransactionCanceledException",
+                               "Message": "Transaction cancelled"},
+                     "CancellationReasons": reasons},
+                    "TransactWriteItems",
+                )
+            for action in TransactItems:
+                if "Put" in action:
+                    put = action["Put"]
+                    self.tables[put["TableName"]]._put(_deserialize(put["Item"]))
+                elif "Update" in action:
+                    update = action["Update"]
+                    self.tables[update["TableName"]]._update(
+                        _deserialize(update["Key"]),
+                        update["UpdateExpression"],
+                        _deserialize(update.get("ExpressionAttributeValues", {})),
+                        update.get("ExpressionAttributeNames", {}),
+                    )
+        return {}
+
+
+def _deserialize(attributes):
+    return {k: _deserializer.deserialize(v) for k, v in attributes.items()}
+
+
+def generate_fleet(station_count, session_count, seed):
+    """Build Stations and Sessions items for a synthetic fleet."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    stations = []
+    for s in range(station_count):
+        station_id = f"station-{s:06d}"
+        stations.append({
+            "PK": f"STATION#{station_id}",
+            "SK": "METADATA",
+            "stationId": station_id,
+            "name": f"Bench station {s}",
+            "address": "Synthetic",
+            "latitude": Decimal(str(round(rng.uniform(29.5, 33.3), 6))),
+            "longitude": Decimal(str(round(rng.uniform(34.2, 35.9), 6))),
+            "totalPorts": 0,
+            "powerKw": Decimal(rng.choice(["22", "50", "150", "350"])),
+            "tariffPerKwh": Decimal(rng.choice(["0.25", "0.35", "0.45"])),
+            "status": "ACTIVE",
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+    ports = []
+    sessions = []
+    for n in range(session_count):
+        station = stations[rng.randrange(station_count)]
+        station["totalPorts"] += 1
+        port_id = f"port-{station['stationId']}-{station['totalPorts']:03d}"
+        session_id = f"sess-{n:08d}"
+        ports.append({
+            "PK": station["PK"],
+            "SK": f"PORT#{port_id}",
+            "portId": port_id,
+            "stationId": station["stationId"],
+            "portNumber": station["totalPorts"],
+            "status": "CHARGING",
+            "updatedAt": now,
+        })
+        charge = Decimal(str(round(rng.uniform(0, 99), 2)))
+        capacity = Decimal(rng.choice(["40", "60", "75", "100"]))
+        energy = (charge * capacity / 100).quantize(Decimal("0.0001"))
+        sessions.append({
+            "PK": f"SESSION#{session_id}",
+            "SK": "METADATA",
+            "sessionId": session_id,
+            "userId": f"user-{n:08d}",
+            "stationId": station["stationId"],
+            "portId": port_id,
+            "status": "STARTED" if rng.random() < 0.1 else "IN_PROGRESS",
+            "chargePercent": charge,
+            "energyConsumedKwh": energy,
+            "totalCost": (energy * station["tariffPerKwh"]).quantize(Decimal("0.01")),
+            "tariffPerKwh": station["tariffPerKwh"],
+            "batteryCapacityKwh": capacity,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+    for station in stations:
+        station.update(freePorts=0, reservedPorts=0, chargingPorts=station["totalPorts"], errorPorts=0, version=1)
+    return stations + ports, sessions
+
+
+def install_backend(station_items, session_items, latency_seconds):
+    """Swap the simulator's DynamoDB handles for fresh in-memory tables."""
+    stats = CallStats(latency_seconds)
+    tables = {
+        simulator.SESSIONS_TABLE: InMemoryTable("Sessions", stats),
+        simulator.STATIONS_TABLE: InMemoryTable("Stations", stats),
+        simulator.ERROR_LOGS_TABLE: InMemoryTable("ErrorLogs", stats),
+    }
+    for item in station_items:
+        tables[simulator.STATIONS_TABLE]._put(item)
+    for item in session_items:
+        tables[simulator.SESSIONS_TABLE]._put(item)
+
+    simulator.sessions_table = tables[simulator.SESSIONS_TABLE]
+    simulator.stations_table = tables[simulator.STATIONS_TABLE]
+    simulator.error_logs_table = tables[simulator.ERROR_LOGS_TABLE]
+    simulator.dynamodb_client = InMemoryClient(tables, stats)
+    # Fleets reuse station ids, so cached metadata must not leak between them.
+    simulator.station_metadata_cache.clear()
+    return stats
+
+
+def invoke(event):
+    """Run lambda_handler with its (very verbose) stdout discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        resp = simulator.lambda_handler(event, None)
+    body = resp["body"]
+    return json.loads(body) if body.startswith("{") else {}
+
+
+def run_scenario(station_count, session_count, engine, latency_seconds, seed):
+    station_items, session_items = generate_fleet(station_count, session_count, seed)
+    stats = install_backend(station_items, session_items, latency_seconds)
+    event = {"engine": engine}
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    results = invoke(event)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    calls = dict(sorted(stats.calls.items()))
+    backend_seconds = stats.seconds
+
+    # Measure memory on a second, identical fleet so tracing overhead does
+    # not distort the timings above.
+    station_items, session_items = generate_fleet(station_count, session_count, seed)
+    install_backend(station_items, session_items, 0.0)
+    tracemalloc.start()
+    invoke(event)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_calls = sum(calls.values())
+    return {
+        "stations": station_count,
+        "sessions": session_count,
+        "engine": engine,
+        "wallSeconds": round(wall, 4),
+        "cpuSeconds": round(cpu, 4),
+        "backendSeconds": round(backend_seconds, 4),
+        "sessionsPerSecond": round(session_count / wall, 1) if wall else None,
+        "backendCalls": total_calls,
+        "backendCallsPerTick": round(total_calls / simulator.TICKS_PER_INVOCATION, 1),
+        "backendCallsByOperation": calls,
+        "peakMemoryMb": round(peak / (1024 * 1024), 2),
+        "updated": results.get("updated"),
+        "completed": results.get("completed"),
+        "errors": results.get("errors"),
+        "persistence": results.get("persistence"),
+    }
+
+
+def _legacy_tick(item, station_power, active_ports):
+    """The original per-tick Decimal -> float -> Decimal round trip on a session item."""
+    charge = float(item.get("chargePercent", 0))
+    energy = float(item.get("energyConsumedKwh", 0))
+    cost = float(item.get("totalCost", 0))
+    tariff = float(item.get("tariffPerKwh", 0))
+    capacity = float(item.get("batteryCapacityKwh", 60))
+    power = float(station_power) / max(active_ports, 1)
+    energy_added = power * simulator.calculate_power_factor(charge) * simulator.TICK_INTERVAL_SECONDS / 3600
+    new_charge = min(100.0, charge + (energy_added / capacity) * 100)
+    item["chargePercent"] = Decimal(str(round(new_charge, 2)))
+    item["energyConsumedKwh"] = Decimal(str(round(energy + energy_added, 4)))
+    item["totalCost"] = Decimal(str(round(cost + energy_added * tariff, 2)))
+    item["updatedAt"] = datetime.now(timezone.utc).isoformat()
+
+
+def micro_benchmark(session_count, seed):
+    """
+    Time the per-session tick on Decimal items (the original representation)
+    against SessionState, and compare the memory each keeps per session.
+    """
+    station_items, session_items = generate_fleet(max(session_count // 10, 1), session_count, seed)
+    stations = {s["stationId"]: s for s in station_items if s["SK"] == "METADATA"}
+    ticks = simulator.TICKS_PER_INVOCATION
+
+    items = [dict(item) for item in session_items]
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for item in items:
+            _legacy_tick(item, stations[item["stationId"]]["powerKw"], 4)
+    legacy_seconds = time.perf_counter() - started
+
+    states = [simulator.SessionState(dict(item), stations[item["stationId"]], 4) for item in session_items]
+    started = time.perf_counter()
+    for _ in range(ticks):
+        for state in states:
+            simulator._simulate_tick(state, state.station_power_kw / 4)
+    compact_seconds = time.perf_counter() - started
+
+    float_state_bytes = sys.getsizeof(states[0]) + sum(
+        sys.getsizeof(getattr(states[0], name)) for name in
+        ("charge_percent", "energy_consumed_kwh", "total_cost", "tariff_per_kwh", "battery_capacity_kwh")
+    )
+    decimal_item_bytes = sys.getsizeof(items[0]) + sum(
+        sys.getsizeof(items[0][name]) for name in
+        ("chargePercent", "energyConsumedKwh", "totalCost", "tariffPerKwh", "batteryCapacityKwh")
+    )
+    session_ticks = session_count * ticks
+    return {
+        "sessions": session_count,
+        "ticks": ticks,
+        "decimalItemNsPerTick": round(legacy_seconds / session_ticks * 1e9, 1),
+        "sessionStateNsPerTick": round(compact_seconds / session_ticks * 1e9, 1),
+        "speedup": round(legacy_seconds / compact_seconds, 2) if compact_seconds else None,
+        "decimalItemBytes": decimal_item_bytes,
+        "sessionStateBytes": float_state_bytes,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _append_results(path, run):
+    history = []
+    if os.path.exists(path):
+        with open(path) as f:
+            history = json.load(f)
+    history.append(run)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the charging simulator on synthetic fleets")
+    parser.add_argument("--fleet", action="append", metavar="STATIONS:SESSIONS",
+                        help=f"fleet size, may be repeated (default: {' '.join(DEFAULT_FLEETS)})")
+    parser.add_argument("--engine", default=simulator.SIMULATOR_ENGINE,
+                        choices=sorted(simulator.TICK_ENGINES))
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="simulated round-trip latency per backend call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="simulator_benchmark.json",
+                        help="JSON file the run is appended to")
+    parser.add_argument("--micro", type=int, metavar="SESSIONS",
+                        help="only run the tick-state microbenchmark on this many sessions")
+    args = parser.parse_args()
+
+    if args.micro:
+        result = micro_benchmark(args.micro, args.seed)
+        print(json.dumps(result, indent=2))
+        _append_results(args.output, {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "micro": result,
+        })
+        return
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "latencyMs": args.latency_ms,
+        "scenarios": [],
+    }
+    for fleet in args.fleet or DEFAULT_FLEETS:
+        station_count, session_count = (int(n) for n in fleet.split(":"))
+        result = run_scenario(station_count, session_count, args.engine,
+                              args.latency_ms / 1000, args.seed)
+        run["scenarios"].append(result)
+        print(f"{station_count:>6} stations {session_count:>7} sessions  "
+              f"{result['wallSeconds']:>8.3f}s  {result['sessionsPerSecond']:>10} sessions/s  "
+              f"{result['backendCalls']:>6} calls  {result['peakMemoryMb']:>8} MB peak  "
+              f"{result['persistence']['suppressed']:>7} writes suppressed")
+
+    _append_results(args.output, run)
+    print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
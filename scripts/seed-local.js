@@ -23,6 +23,9 @@ const TABLES = [
       { AttributeName: 'SK', AttributeType: 'S' },
       { AttributeName: 'status', AttributeType: 'S' },
       { AttributeName: 'stationId', AttributeType: 'S' },
+      { AttributeName: 'entityType', AttributeType: 'S' },
+      { AttributeName: 'geoCell', AttributeType: 'S' },
+      { AttributeName: 'geohash', AttributeType: 'S' },
     ],
     GlobalSecondaryIndexes: [
       {
@@ -33,6 +36,22 @@ const TABLES = [
         ],
         Projection: { ProjectionType: 'ALL' },
       },
+      {
+        IndexName: 'entityType-index',
+        KeySchema: [
+          { AttributeName: 'entityType', KeyType: 'HASH' },
+          { AttributeName: 'stationId', KeyType: 'RANGE' },
+        ],
+        Projection: { ProjectionType: 'ALL' },
+      },
+      {
+        IndexName: 'geo-index',
+        KeySchema: [
+          { AttributeName: 'geoCell', KeyType: 'HASH' },
+          { AttributeName: 'geohash', KeyType: 'RANGE' },
+        ],
+        Projection: { ProjectionType: 'ALL' },
+      },
     ],
     BillingMode: 'PAY_PER_REQUEST',
   },
@@ -152,10 +171,11 @@ async function seedData() {
   console.log('\nЗаполнение seed-данными...');
 
   await put('Stations', {
-    PK: 'STATION#station-001', SK: 'METADATA',
+    PK: 'STATION#station-001', SK: 'METADATA', entityType: 'STATION',
     stationId: 'station-001', name: 'Центральный хаб зарядки', address: 'ул. Главная, 123',
-    latitude: 40.7128, longitude: -74.0060, status: 'ACTIVE',
+    latitude: 40.7128, longitude: -74.0060, geohash: 'dr5regw3p', geoCell: 'dr5r', status: 'ACTIVE',
     totalPorts: 3, powerKw: 150, tariffPerKwh: 0.35,
+    freePorts: 3, reservedPorts: 0, chargingPorts: 0, errorPorts: 0, version: 1,
     createdAt: '2026-01-01T00:00:00Z', updatedAt: '2026-01-01T00:00:00Z',
   });
   for (let i = 1; i <= 3; i++) {
@@ -168,10 +188,11 @@ async function seedData() {
   console.log('  + station-001 (Центральный хаб, 3 порта, ACTIVE)');
 
   await put('Stations', {
-    PK: 'STATION#station-002', SK: 'METADATA',
+    PK: 'STATION#station-002', SK: 'METADATA', entityType: 'STATION',
     stationId: 'station-002', name: 'Аэропорт Быстрая Зарядка', address: 'бульвар Аэропорт, 456',
-    latitude: 40.6413, longitude: -73.7781, status: 'ACTIVE',
+    latitude: 40.6413, longitude: -73.7781, geohash: 'dr5x1ns2t', geoCell: 'dr5x', status: 'ACTIVE',
     totalPorts: 2, powerKw: 350, tariffPerKwh: 0.50,
+    freePorts: 2, reservedPorts: 0, chargingPorts: 0, errorPorts: 0, version: 1,
     createdAt: '2026-01-15T00:00:00Z', updatedAt: '2026-01-15T00:00:00Z',
   });
   for (let i = 1; i <= 2; i++) {
@@ -184,10 +205,11 @@ async function seedData() {
   console.log('  + station-002 (Аэропорт, 2 порта, ACTIVE)');
 
   await put('Stations', {
-    PK: 'STATION#station-003', SK: 'METADATA',
+    PK: 'STATION#station-003', SK: 'METADATA', entityType: 'STATION',
     stationId: 'station-003', name: 'Парковый зарядный пост', address: 'пр-т Парковый, 789',
-    latitude: 40.7580, longitude: -73.9855, status: 'NEW',
+    latitude: 40.7580, longitude: -73.9855, geohash: 'dr5ru7v2s', geoCell: 'dr5r', status: 'NEW',
     totalPorts: 4, powerKw: 200, tariffPerKwh: 0.40,
+    freePorts: 4, reservedPorts: 0, chargingPorts: 0, errorPorts: 0, version: 1,
     createdAt: '2026-02-01T00:00:00Z', updatedAt: '2026-02-01T00:00:00Z',
   });
   for (let i = 1; i <= 4; i++) {
@@ -21,11 +21,16 @@ aws dynamodb create-table \
     AttributeName=SK,AttributeType=S \
     AttributeName=status,AttributeType=S \
     AttributeName=stationId,AttributeType=S \
+    AttributeName=entityType,AttributeType=S \
+    AttributeName=geoCell,AttributeType=S \
+    AttributeName=geohash,AttributeType=S \
   --key-schema \
     AttributeName=PK,KeyType=HASH \
     AttributeName=SK,KeyType=RANGE \
   --global-secondary-indexes \
     'IndexName=status-index,KeySchema=[{AttributeName=status,KeyType=HASH},{AttributeName=stationId,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
+    'IndexName=entityType-index,KeySchema=[{AttributeName=entityType,KeyType=HASH},{AttributeName=stationId,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
+    'IndexName=geo-index,KeySchema=[{AttributeName=geoCell,KeyType=HASH},{AttributeName=geohash,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
   --billing-mode PAY_PER_REQUEST \
   --endpoint-url "$ENDPOINT" \
   --region "$REGION" 2>/dev/null || echo "  Stations table already exists"
@@ -89,13 +94,21 @@ aws dynamodb put-item \
   --item '{
     "PK": {"S": "STATION#station-001"},
     "SK": {"S": "METADATA"},
+    "entityType": {"S": "STATION"},
     "stationId": {"S": "station-001"},
     "name": {"S": "Downtown Charging Hub"},
     "address": {"S": "123 Main Street, EV City"},
     "latitude": {"N": "40.7128"},
     "longitude": {"N": "-74.0060"},
+    "geohash": {"S": "dr5regw3p"},
+    "geoCell": {"S": "dr5r"},
     "status": {"S": "ACTIVE"},
     "totalPorts": {"N": "3"},
+    "freePorts": {"N": "3"},
+    "reservedPorts": {"N": "0"},
+    "chargingPorts": {"N": "0"},
+    "errorPorts": {"N": "0"},
+    "version": {"N": "1"},
     "powerKw": {"N": "150"},
     "tariffPerKwh": {"N": "0.35"},
     "createdAt": {"S": "2026-01-01T00:00:00Z"},
@@ -125,13 +138,21 @@ aws dynamodb put-item \
   --item '{
     "PK": {"S": "STATION#station-002"},
     "SK": {"S": "METADATA"},
+    "entityType": {"S": "STATION"},
     "stationId": {"S": "station-002"},
     "name": {"S": "Airport Fast Charge"},
     "address": {"S": "456 Airport Blvd, EV City"},
     "latitude": {"N": "40.6413"},
     "longitude": {"N": "-73.7781"},
+    "geohash": {"S": "dr5x1ns2t"},
+    "geoCell": {"S": "dr5x"},
     "status": {"S": "ACTIVE"},
     "totalPorts": {"N": "2"},
+    "freePorts": {"N": "2"},
+    "reservedPorts": {"N": "0"},
+    "chargingPorts": {"N": "0"},
+    "errorPorts": {"N": "0"},
+    "version": {"N": "1"},
     "powerKw": {"N": "350"},
     "tariffPerKwh": {"N": "0.50"},
     "createdAt": {"S": "2026-01-15T00:00:00Z"},